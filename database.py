@@ -6,11 +6,87 @@ Handles SQLite database operations for the Comcast Port Monitor
 import sqlite3
 import json
 import csv
+import gzip
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterable, List, Optional, Any, Tuple, Union
+import functools
 import os
+import threading
+import time
+
+from scan_result import ScanResult, to_epoch_ms, to_isoformat
+
+def _read_through(max_age: Optional[float] = None):
+    """
+    Cache a DatabaseManager read method by its arguments
+    
+    Entries are tagged with the manager's write generation and are only
+    served while no write has happened since (see DatabaseManager._bump_generation).
+    max_age additionally expires entries whose result depends on the clock.
+    Callers get a shallow copy of the cached list or dict; the records
+    inside are shared and must not be modified.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            generation = self._generation
+            now = time.monotonic()
+            
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == generation and (max_age is None or now - entry[1] < max_age):
+                self._cache_hits += 1
+                return entry[2].copy()
+            
+            self._cache_misses += 1
+            value = method(self, *args, **kwargs)
+            
+            # Tagged with the generation read before the query, so a write
+            # racing with it leaves the entry already stale
+            if len(self._cache) >= self.CACHE_MAX_ENTRIES:
+                self._cache.clear()
+            self._cache[key] = (generation, now, value)
+            return value.copy()
+        return wrapper
+    return decorator
 
 class DatabaseManager:
+    # Columns added after the original schema, with their types, so
+    # init_database can upgrade existing databases in place
+    ADDED_COLUMNS = {
+        # Per-phase probe latencies in microseconds (see port_scanner.PhaseTimer)
+        'dns_us': 'INTEGER',
+        'connect_us': 'INTEGER',
+        'tls_handshake_us': 'INTEGER',
+        'first_byte_us': 'INTEGER',
+        'protocol_us': 'INTEGER',
+        # Connection attempts the result took (see port_scanner.RetryPolicy)
+        'attempts': 'INTEGER DEFAULT 1',
+        # Address that answered and its family (see port_scanner._connect_race)
+        'address_family': 'TEXT',
+        'address': 'TEXT'
+    }
+    
+    # Connection tuning applied to every connection (see _get_connection).
+    # WAL lets the UI read while the scheduler writes; NORMAL sync is
+    # durable against crashes in WAL mode and skips an fsync per commit.
+    BUSY_TIMEOUT_SECONDS = 5.0
+    SYNCHRONOUS = 'NORMAL'
+    CACHE_SIZE_KB = 8192
+    MMAP_SIZE_BYTES = 64 * 1024 * 1024
+    WAL_AUTOCHECKPOINT_PAGES = 1000
+    
+    # PRAGMA user_version of a fully migrated database. Version 1 stores
+    # timestamps as integer epoch milliseconds instead of ISO 8601 text,
+    # version 2 adds the latest_status table and version 3 the hourly rollups.
+    SCHEMA_VERSION = 3
+    
+    # Bucket width of scan_rollups_hourly, in epoch milliseconds
+    ROLLUP_MS = 3600 * 1000
+    
+    # Read cache size limit (see _read_through); the cache is emptied when full
+    CACHE_MAX_ENTRIES = 256
+    
     def __init__(self, db_path: str = "port_monitor.db"):
         """
         Initialize the database manager
@@ -19,28 +95,258 @@ class DatabaseManager:
             db_path: Path to the SQLite database file
         """
         self.db_path = db_path
+        
+        # One persistent connection per thread (see _get_connection)
+        self._local = threading.local()
+        self._connections = {}  # thread -> connection
+        self._connections_lock = threading.Lock()
+        self.last_checkpoint = None
+        
+        # Read-through cache, invalidated by bumping the write generation
+        self._cache = {}  # (method, args, kwargs) -> (generation, time, value)
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        
         self.init_database()
     
+    def _bump_generation(self):
+        """Invalidate every cached read (called by each write path after it commits)"""
+        with self._generation_lock:
+            self._generation += 1
+    
+    def get_cache_stats(self) -> Dict:
+        """
+        Get read cache statistics
+        
+        Only writes made through this manager invalidate the cache, which
+        holds as long as it is the one writer of the database file.
+        
+        Returns:
+            Dictionary with hit/miss counts, hit rate, entries and generation
+        """
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            'hits': self._cache_hits,
+            'misses': self._cache_misses,
+            'hit_rate': self._cache_hits / lookups if lookups else 0.0,
+            'entries': len(self._cache),
+            'generation': self._generation
+        }
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get the calling thread's persistent connection, opening it on first use
+        
+        Connections stay open between calls, so the per-port save and the
+        UI's refresh queries skip connection setup and reuse sqlite3's
+        prepared statement cache. Use it as a context manager for a
+        transaction, as with a fresh connection.
+        
+        Returns:
+            SQLite connection owned by the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False only so close() can run from any thread;
+            # each connection is otherwise used by its own thread alone
+            conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT_SECONDS,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute(f'PRAGMA synchronous = {self.SYNCHRONOUS}')
+            conn.execute(f'PRAGMA cache_size = -{self.CACHE_SIZE_KB}')
+            conn.execute(f'PRAGMA mmap_size = {self.MMAP_SIZE_BYTES}')
+            conn.execute(f'PRAGMA wal_autocheckpoint = {self.WAL_AUTOCHECKPOINT_PAGES}')
+            self._local.conn = conn
+            
+            with self._connections_lock:
+                # Close connections left behind by threads that have exited
+                for thread in [t for t in self._connections if not t.is_alive()]:
+                    self._connections.pop(thread).close()
+                self._connections[threading.current_thread()] = conn
+        return conn
+    
+    def checkpoint(self, mode: str = 'PASSIVE') -> Dict:
+        """
+        Copy committed WAL frames back into the database file
+        
+        PASSIVE never blocks readers or writers and is cheap enough to run
+        after every scan cycle; TRUNCATE also resets the WAL file to zero
+        bytes and is used on shutdown and after cleanup.
+        
+        Args:
+            mode: PASSIVE, FULL, RESTART or TRUNCATE
+            
+        Returns:
+            Dictionary with the checkpoint mode, whether it was blocked, and
+            the WAL frame counts
+        """
+        mode = mode.upper()
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Invalid checkpoint mode: {mode}")
+        
+        busy, wal_frames, checkpointed_frames = self._get_connection().execute(
+            f'PRAGMA wal_checkpoint({mode})'
+        ).fetchone()
+        
+        self.last_checkpoint = {
+            'mode': mode,
+            'time': datetime.now().isoformat(),
+            'busy': bool(busy),
+            'wal_frames': wal_frames,
+            'checkpointed_frames': checkpointed_frames
+        }
+        return self.last_checkpoint
+    
+    def close(self):
+        """Checkpoint the WAL and close every thread's connection (call on application shutdown)"""
+        try:
+            self.checkpoint('TRUNCATE')
+        except sqlite3.Error:
+            pass  # another connection is mid-write; the WAL is replayed on next open
+        
+        with self._connections_lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._local = threading.local()
+        
+        for conn in connections:
+            conn.close()
+    
     def init_database(self):
         """Initialize the database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
+            # Write-ahead logging is a property of the database file, so
+            # setting it once here covers every later connection
+            cursor.execute('PRAGMA journal_mode = WAL')
+            
             # Create port_scans table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS port_scans (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME NOT NULL,
+                    timestamp INTEGER NOT NULL,
                     host TEXT NOT NULL,
                     port INTEGER NOT NULL,
                     status TEXT NOT NULL,
                     response_time_ms INTEGER,
                     error_message TEXT,
                     protocol_info TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    dns_us INTEGER,
+                    connect_us INTEGER,
+                    tls_handshake_us INTEGER,
+                    first_byte_us INTEGER,
+                    protocol_us INTEGER,
+                    attempts INTEGER DEFAULT 1,
+                    address_family TEXT,
+                    address TEXT
+                )
+            ''')
+            
+            # Add newer columns to databases created before they existed
+            cursor.execute('PRAGMA table_info(port_scans)')
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            for column, column_type in self.ADDED_COLUMNS.items():
+                if column not in existing_columns:
+                    cursor.execute(f'ALTER TABLE port_scans ADD COLUMN {column} {column_type}')
+            
+            # Create host_outages table (one row per host found down in a cycle)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS host_outages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp INTEGER NOT NULL,
+                    host TEXT NOT NULL,
+                    reason TEXT,
+                    ports_timed_out TEXT,
+                    ports_skipped INTEGER DEFAULT 0,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
+            # Create latest_status table (current state of every host/port,
+            # kept up to date by the trigger below)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS latest_status (
+                    host TEXT NOT NULL,
+                    port INTEGER NOT NULL,
+                    scan_id INTEGER NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    response_time_ms INTEGER,
+                    error_message TEXT,
+                    PRIMARY KEY (host, port)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Every insert path (single, batched, bulk) updates latest_status
+            # in the same transaction; an older result arriving late does
+            # not overwrite a newer one
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_port_scans_latest_status
+                AFTER INSERT ON port_scans
+                BEGIN
+                    INSERT INTO latest_status 
+                    (host, port, scan_id, timestamp, status, response_time_ms, error_message)
+                    VALUES (NEW.host, NEW.port, NEW.id, NEW.timestamp, NEW.status,
+                            NEW.response_time_ms, NEW.error_message)
+                    ON CONFLICT (host, port) DO UPDATE SET
+                        scan_id = excluded.scan_id,
+                        timestamp = excluded.timestamp,
+                        status = excluded.status,
+                        response_time_ms = excluded.response_time_ms,
+                        error_message = excluded.error_message
+                    WHERE excluded.timestamp >= latest_status.timestamp;
+                END
+            ''')
+            
+            # Create scan_rollups_hourly table: per host/port/hour counts by
+            # status plus OPEN latency, kept up to date by the trigger below
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scan_rollups_hourly (
+                    hour_start INTEGER NOT NULL,
+                    host TEXT NOT NULL,
+                    port INTEGER NOT NULL,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    open_count INTEGER NOT NULL DEFAULT 0,
+                    closed_count INTEGER NOT NULL DEFAULT 0,
+                    timeout_count INTEGER NOT NULL DEFAULT 0,
+                    error_count INTEGER NOT NULL DEFAULT 0,
+                    latency_sum INTEGER NOT NULL DEFAULT 0,
+                    latency_min INTEGER,
+                    latency_max INTEGER,
+                    PRIMARY KEY (hour_start, host, port)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Latency figures only cover OPEN results, matching the average
+            # response time the statistics have always reported
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_port_scans_rollup_hourly
+                AFTER INSERT ON port_scans
+                BEGIN
+                    INSERT INTO scan_rollups_hourly 
+                    (hour_start, host, port, total, open_count, closed_count, timeout_count,
+                     error_count, latency_sum, latency_min, latency_max)
+                    VALUES (NEW.timestamp - NEW.timestamp % {self.ROLLUP_MS}, NEW.host, NEW.port, 1,
+                            NEW.status = 'OPEN', NEW.status = 'CLOSED', NEW.status = 'TIMEOUT',
+                            NEW.status = 'ERROR',
+                            CASE WHEN NEW.status = 'OPEN' THEN IFNULL(NEW.response_time_ms, 0) ELSE 0 END,
+                            CASE WHEN NEW.status = 'OPEN' THEN NEW.response_time_ms END,
+                            CASE WHEN NEW.status = 'OPEN' THEN NEW.response_time_ms END)
+                    ON CONFLICT (hour_start, host, port) DO UPDATE SET
+                        total = total + 1,
+                        open_count = open_count + excluded.open_count,
+                        closed_count = closed_count + excluded.closed_count,
+                        timeout_count = timeout_count + excluded.timeout_count,
+                        error_count = error_count + excluded.error_count,
+                        latency_sum = latency_sum + excluded.latency_sum,
+                        latency_min = IFNULL(MIN(latency_min, excluded.latency_min), IFNULL(latency_min, excluded.latency_min)),
+                        latency_max = IFNULL(MAX(latency_max, excluded.latency_max), IFNULL(latency_max, excluded.latency_max));
+                END
+            ''')
+            
             # Create configuration table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS configuration (
@@ -67,74 +373,340 @@ class DatabaseManager:
                 ON port_scans(status)
             ''')
             
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_host_outages_timestamp 
+                ON host_outages(timestamp)
+            ''')
+            
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
+            if version < 1:
+                self._migrate_epoch_timestamps(cursor)
+            if version < 2:
+                self._backfill_latest_status(cursor)
+            if version < 3:
+                self._backfill_rollups(cursor)
+            if version < self.SCHEMA_VERSION:
+                cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+            
             conn.commit()
     
-    def save_scan_result(self, result: Dict) -> int:
+    @staticmethod
+    def _migrate_epoch_timestamps(cursor: sqlite3.Cursor):
+        """
+        Convert ISO 8601 text timestamps to integer epoch milliseconds in place
+        
+        The old columns were declared DATETIME, which has numeric affinity,
+        so integers written into them are stored as integers and the
+        columns need no rebuild. The text was local time, hence 'utc' to
+        get back to a true epoch. Runs inside init_database's transaction,
+        so an interrupted migration leaves the database untouched.
+        """
+        for table in ('port_scans', 'host_outages'):
+            cursor.execute(f'''
+                UPDATE {table}
+                SET timestamp = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+                WHERE typeof(timestamp) = 'text'
+            ''')
+    
+    @staticmethod
+    def _backfill_latest_status(cursor: sqlite3.Cursor):
+        """Fill latest_status from the scan history of a database created before it existed"""
+        # With MAX() SQLite takes the other bare columns from the row holding the maximum
+        cursor.execute('''
+            INSERT OR REPLACE INTO latest_status 
+            (host, port, scan_id, timestamp, status, response_time_ms, error_message)
+            SELECT host, port, id, MAX(timestamp), status, response_time_ms, error_message
+            FROM port_scans
+            GROUP BY host, port
+        ''')
+    
+    @classmethod
+    def _backfill_rollups(cls, cursor: sqlite3.Cursor):
+        """Fill scan_rollups_hourly from the scan history of a database created before it existed"""
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO scan_rollups_hourly 
+            (hour_start, host, port, total, open_count, closed_count, timeout_count,
+             error_count, latency_sum, latency_min, latency_max)
+            SELECT timestamp - timestamp % {cls.ROLLUP_MS}, host, port, COUNT(*),
+                   SUM(status = 'OPEN'), SUM(status = 'CLOSED'), SUM(status = 'TIMEOUT'),
+                   SUM(status = 'ERROR'),
+                   IFNULL(SUM(CASE WHEN status = 'OPEN' THEN response_time_ms END), 0),
+                   MIN(CASE WHEN status = 'OPEN' THEN response_time_ms END),
+                   MAX(CASE WHEN status = 'OPEN' THEN response_time_ms END)
+            FROM port_scans
+            GROUP BY 1, host, port
+        ''')
+    
+    INSERT_SCAN_SQL = '''
+        INSERT INTO port_scans 
+        (timestamp, host, port, status, response_time_ms, error_message, protocol_info,
+         dns_us, connect_us, tls_handshake_us, first_byte_us, protocol_us, attempts,
+         address_family, address)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    # Positions of the INSERT_SCAN_SQL columns in a ScanResult.as_row() tuple
+    _ROW_INSERT_ORDER = tuple(ScanResult.ROW_FIELDS.index(key) for key in (
+        'epoch_ms', 'host', 'port', 'status', 'response_time_ms', 'error_message',
+        'protocol_info', 'dns_us', 'connect_us', 'tls_handshake_us', 'first_byte_us',
+        'protocol_us', 'attempts', 'address_family', 'address'
+    ))
+    _ROW_PROTOCOL_INFO = ScanResult.ROW_FIELDS.index('protocol_info')
+    
+    @classmethod
+    def _scan_row(cls, result: Union[ScanResult, Dict, tuple]) -> tuple:
+        """
+        Build the INSERT_SCAN_SQL parameters for one result
+        
+        Accepts ScanResult records, dictionaries and ScanResult.as_row()
+        tuples. protocol_info that is already JSON text (as in rows from
+        ShardedScanner.scan_batches) is stored without re-encoding.
+        """
+        if isinstance(result, tuple):
+            protocol_info = result[cls._ROW_PROTOCOL_INFO]
+            if protocol_info is None or isinstance(protocol_info, str):
+                return tuple(result[index] for index in cls._ROW_INSERT_ORDER)
+            result = ScanResult.from_row(result)
+        
+        # Convert protocol_info to JSON string if it exists
+        protocol_info_json = None
+        if isinstance(result.get('protocol_info'), str):
+            protocol_info_json = result['protocol_info']
+        elif result.get('protocol_info'):
+            protocol_info_json = json.dumps(result['protocol_info'])
+        
+        if isinstance(result, ScanResult):
+            epoch_ms = result.epoch_ms
+        else:
+            epoch_ms = to_epoch_ms(result['timestamp'])
+        
+        return (
+            epoch_ms,
+            result['host'],
+            result['port'],
+            result['status'],
+            result['response_time_ms'],
+            result['error_message'],
+            protocol_info_json,
+            result.get('dns_us'),
+            result.get('connect_us'),
+            result.get('tls_handshake_us'),
+            result.get('first_byte_us'),
+            result.get('protocol_us'),
+            result.get('attempts', 1),
+            result.get('address_family'),
+            result.get('address')
+        )
+    
+    def save_scan_result(self, result: Union[ScanResult, Dict]) -> int:
         """
         Save a single scan result to the database
         
         Args:
-            result: Scan result dictionary
+            result: ScanResult (or a dictionary with the same keys);
+                protocol_info that is already JSON text is stored without
+                re-encoding
             
         Returns:
             ID of the inserted record
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute(self.INSERT_SCAN_SQL, self._scan_row(result))
+            conn.commit()
+        
+        self._bump_generation()
+        return cursor.lastrowid
+    
+    def save_scan_results(self, results: List[Union[ScanResult, Dict]]) -> List[int]:
+        """
+        Save multiple scan results in a single transaction
+        
+        One executemany and one commit for the whole batch, instead of a
+        commit (and fsync) per result.
+        
+        Args:
+            results: List of ScanResult records (or dictionaries)
             
-            # Convert protocol_info to JSON string if it exists
-            protocol_info_json = None
-            if result.get('protocol_info'):
-                protocol_info_json = json.dumps(result['protocol_info'])
+        Returns:
+            List of IDs of the inserted records
+        """
+        if not results:
+            return []
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(self.INSERT_SCAN_SQL, [self._scan_row(result) for result in results])
+            
+            # The batch holds the write lock for the whole transaction, so
+            # its AUTOINCREMENT ids are consecutive
+            cursor.execute('SELECT last_insert_rowid()')
+            last_id = cursor.fetchone()[0]
+            conn.commit()
+        
+        self._bump_generation()
+        return list(range(last_id - len(results) + 1, last_id + 1))
+    
+    def bulk_load(self, results: Iterable[Union[ScanResult, Dict, tuple]], chunk_size: int = 10000) -> int:
+        """
+        Stream a very large number of results into the database
+        
+        Meant for one-off sweeps (e.g. ShardedScanner.scan_targets): results
+        are consumed lazily and written chunk_size rows per transaction, with
+        synchronous=OFF for the duration. That is safe if the application
+        crashes, but a power failure during the load can lose or corrupt
+        recent writes, so use it for sweeps that can be rerun.
+        
+        Args:
+            results: Iterable of ScanResult records, dictionaries or
+                ScanResult.as_row() tuples (rows from
+                ShardedScanner.scan_batches go in without decoding)
+            chunk_size: Rows per transaction
+            
+        Returns:
+            Number of rows written
+        """
+        conn = self._get_connection()
+        previous_synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+        conn.execute('PRAGMA synchronous = OFF')
+        
+        total = 0
+        try:
+            rows = []
+            for result in results:
+                rows.append(self._scan_row(result))
+                if len(rows) >= chunk_size:
+                    with conn:
+                        conn.executemany(self.INSERT_SCAN_SQL, rows)
+                    total += len(rows)
+                    rows = []
+            
+            if rows:
+                with conn:
+                    conn.executemany(self.INSERT_SCAN_SQL, rows)
+                total += len(rows)
+        finally:
+            conn.execute(f'PRAGMA synchronous = {int(previous_synchronous)}')
+            self._bump_generation()
+        
+        return total
+    
+    @staticmethod
+    def _host_condition(host: Union[str, Tuple[str, ...]]) -> Tuple[str, str]:
+        """
+        Build the SQL condition and its parameter for a host filter
+        
+        A tuple of hosts (e.g. TargetSpec.iter_hosts() of a multi-host
+        target) is bound as one JSON array, so even a large CIDR block
+        stays within SQLite's parameter limit.
+        """
+        if isinstance(host, str):
+            return 'host = ?', host
+        return 'host IN (SELECT value FROM json_each(?))', json.dumps(list(host))
+    
+    def save_host_outage(self, outage: Dict) -> int:
+        """
+        Save a host outage event to the database
+        
+        Args:
+            outage: Outage event dictionary (see port_scanner.LivenessCycle)
+            
+        Returns:
+            ID of the inserted record
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
             
             cursor.execute('''
-                INSERT INTO port_scans 
-                (timestamp, host, port, status, response_time_ms, error_message, protocol_info)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO host_outages 
+                (timestamp, host, reason, ports_timed_out, ports_skipped)
+                VALUES (?, ?, ?, ?, ?)
             ''', (
-                result['timestamp'],
-                result['host'],
-                result['port'],
-                result['status'],
-                result['response_time_ms'],
-                result['error_message'],
-                protocol_info_json
+                to_epoch_ms(outage['timestamp']),
+                outage['host'],
+                outage.get('reason'),
+                json.dumps(outage.get('ports_timed_out', [])),
+                outage.get('ports_skipped', 0)
             ))
             
             conn.commit()
-            return cursor.lastrowid
+        
+        self._bump_generation()
+        return cursor.lastrowid
     
-    def save_scan_results(self, results: List[Dict]) -> List[int]:
+    def get_host_outages(self, hours: int = 24, host: Union[str, Tuple[str, ...]] = None) -> List[Dict]:
         """
-        Save multiple scan results to the database
+        Get host outage events
         
         Args:
-            results: List of scan result dictionaries
+            hours: Number of hours to look back
+            host: Filter by host, or a tuple of hosts (optional)
             
         Returns:
-            List of IDs of the inserted records
+            List of outage dictionaries, newest first
         """
-        ids = []
-        for result in results:
-            record_id = self.save_scan_result(result)
-            ids.append(record_id)
-        return ids
+        since = to_epoch_ms(datetime.now() - timedelta(hours=hours))
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
+            query = 'SELECT * FROM host_outages WHERE timestamp >= ?'
+            params = [since]
+            
+            if host:
+                condition, value = self._host_condition(host)
+                query += f' AND {condition}'
+                params.append(value)
+            
+            query += ' ORDER BY timestamp DESC'
+            cursor.execute(query, params)
+            
+            outages = []
+            for row in cursor.fetchall():
+                outage = dict(row)
+                outage['timestamp'] = to_isoformat(outage['timestamp'])
+                try:
+                    outage['ports_timed_out'] = json.loads(outage['ports_timed_out'] or '[]')
+                except json.JSONDecodeError:
+                    outage['ports_timed_out'] = []
+                outages.append(outage)
+            
+            return outages
     
-    def get_recent_scans(self, limit: int = 100, host: str = None, port: int = None) -> List[Dict]:
+    @staticmethod
+    def _row_to_result(cursor: sqlite3.Cursor, row: tuple) -> ScanResult:
+        """Row factory building a ScanResult from a port_scans (or latest_status) row"""
+        # Start from defaults so queries selecting a subset of columns still give full records
+        result = ScanResult(None, None, epoch_ms=0)
+        for column, value in zip(cursor.description, row):
+            name = column[0]
+            if name == 'protocol_info' and value:
+                try:
+                    value = json.loads(value)
+                except json.JSONDecodeError:
+                    value = None
+            if name in ScanResult.FIELDS or name in ScanResult.RECORD_FIELDS:
+                result[name] = value
+        return result
+    
+    @_read_through()
+    def get_recent_scans(self, limit: int = 100, host: Union[str, Tuple[str, ...]] = None, port: int = None) -> List[ScanResult]:
         """
         Get recent scan results
         
         Args:
             limit: Maximum number of results to return
-            host: Filter by host (optional)
+            host: Filter by host, or a tuple of hosts (optional)
             port: Filter by port (optional)
             
         Returns:
-            List of scan result dictionaries
+            List of ScanResult records (with id and created_at)
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = self._row_to_result
             
             query = '''
                 SELECT * FROM port_scans 
@@ -143,8 +715,9 @@ class DatabaseManager:
             params = []
             
             if host:
-                query += ' AND host = ?'
-                params.append(host)
+                condition, value = self._host_condition(host)
+                query += f' AND {condition}'
+                params.append(value)
             
             if port:
                 query += ' AND port = ?'
@@ -154,48 +727,71 @@ class DatabaseManager:
             params.append(limit)
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
+            return cursor.fetchall()
+    
+    @_read_through()
+    def get_latest_status(self, host: Union[str, Tuple[str, ...]] = None) -> List[ScanResult]:
+        """
+        Get the most recent result for every port
+        
+        Reads the latest_status table, so the cost depends on the number
+        of ports, not on how much scan history has been kept.
+        
+        Args:
+            host: Filter by host, or a tuple of hosts (optional)
             
-            results = []
-            for row in rows:
-                result = dict(row)
-                # Parse protocol_info JSON
-                if result['protocol_info']:
-                    try:
-                        result['protocol_info'] = json.loads(result['protocol_info'])
-                    except json.JSONDecodeError:
-                        result['protocol_info'] = None
-                results.append(result)
+        Returns:
+            List of ScanResult records ordered by host and port, with id
+            set to the port_scans row they came from
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = self._row_to_result
+            
+            query = '''
+                SELECT host, port, scan_id AS id, timestamp, status, response_time_ms, error_message
+                FROM latest_status
+            '''
+            params = []
+            
+            if host:
+                condition, value = self._host_condition(host)
+                query += f' WHERE {condition}'
+                params.append(value)
+            
+            query += ' ORDER BY host, port'
             
-            return results
+            cursor.execute(query, params)
+            return cursor.fetchall()
     
     def get_scans_by_timerange(self, start_time: datetime, end_time: datetime, 
-                              host: str = None, port: int = None) -> List[Dict]:
+                              host: Union[str, Tuple[str, ...]] = None, port: int = None) -> List[ScanResult]:
         """
         Get scan results within a specific time range
         
         Args:
             start_time: Start of time range
             end_time: End of time range
-            host: Filter by host (optional)
+            host: Filter by host, or a tuple of hosts (optional)
             port: Filter by port (optional)
             
         Returns:
-            List of scan result dictionaries
+            List of ScanResult records (with id and created_at)
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = self._row_to_result
             
             query = '''
                 SELECT * FROM port_scans 
                 WHERE timestamp BETWEEN ? AND ?
             '''
-            params = [start_time.isoformat(), end_time.isoformat()]
+            params = [to_epoch_ms(start_time), to_epoch_ms(end_time)]
             
             if host:
-                query += ' AND host = ?'
-                params.append(host)
+                condition, value = self._host_condition(host)
+                query += f' AND {condition}'
+                params.append(value)
             
             if port:
                 query += ' AND port = ?'
@@ -204,70 +800,48 @@ class DatabaseManager:
             query += ' ORDER BY timestamp ASC'
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            results = []
-            for row in rows:
-                result = dict(row)
-                if result['protocol_info']:
-                    try:
-                        result['protocol_info'] = json.loads(result['protocol_info'])
-                    except json.JSONDecodeError:
-                        result['protocol_info'] = None
-                results.append(result)
-            
-            return results
+            return cursor.fetchall()
     
-    def get_24h_statistics(self, host: str = None) -> Dict:
+    @_read_through(max_age=60)
+    def get_24h_statistics(self, host: Union[str, Tuple[str, ...]] = None) -> Dict:
         """
         Get statistics for the last 24 hours
         
+        Reads the hourly rollups, so the window starts at the top of the
+        hour 24 hours ago and the cost does not grow with the scan rate.
+        
         Args:
-            host: Filter by host (optional)
+            host: Filter by host, or a tuple of hosts (optional)
             
         Returns:
             Dictionary containing statistics
         """
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=24)
+        start_time = datetime.now() - timedelta(hours=24)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # Base query conditions
-            where_clause = "WHERE timestamp BETWEEN ? AND ?"
-            params = [start_time.isoformat(), end_time.isoformat()]
+            where_clause = "WHERE hour_start >= ?"
+            params = [self._hour_start(start_time)]
             
             if host:
-                where_clause += " AND host = ?"
-                params.append(host)
+                condition, value = self._host_condition(host)
+                where_clause += f' AND {condition}'
+                params.append(value)
             
-            # Total scans
+            # Totals, blocked ports (unique ports that were closed/timeout)
+            # and OPEN latency in one pass over the window's rollups
             cursor.execute(f'''
-                SELECT COUNT(*) FROM port_scans {where_clause}
+                SELECT IFNULL(SUM(total), 0), IFNULL(SUM(open_count), 0),
+                       COUNT(DISTINCT CASE WHEN closed_count + timeout_count > 0 THEN port END),
+                       IFNULL(SUM(latency_sum), 0)
+                FROM scan_rollups_hourly {where_clause}
             ''', params)
-            total_scans = cursor.fetchone()[0]
-            
-            # Successful scans
-            cursor.execute(f'''
-                SELECT COUNT(*) FROM port_scans 
-                {where_clause} AND status = 'OPEN'
-            ''', params)
-            successful_scans = cursor.fetchone()[0]
-            
-            # Blocked ports (unique ports that were closed/timeout)
-            cursor.execute(f'''
-                SELECT COUNT(DISTINCT port) FROM port_scans 
-                {where_clause} AND status IN ('CLOSED', 'TIMEOUT')
-            ''', params)
-            blocked_ports = cursor.fetchone()[0]
+            total_scans, successful_scans, blocked_ports, latency_sum = cursor.fetchone()
             
             # Average response time
-            cursor.execute(f'''
-                SELECT AVG(response_time_ms) FROM port_scans 
-                {where_clause} AND status = 'OPEN'
-            ''', params)
-            avg_response = cursor.fetchone()[0] or 0
+            avg_response = latency_sum / successful_scans if successful_scans else 0
             
             # Calculate success rate
             success_rate = (successful_scans / total_scans * 100) if total_scans > 0 else 0
@@ -280,35 +854,63 @@ class DatabaseManager:
                 'avg_response': avg_response
             }
     
-    def get_chart_data(self, hours: int = None) -> List[Dict]:
+    def _hour_start(self, moment: datetime) -> int:
+        """Start of the rollup bucket containing a moment, in epoch milliseconds"""
+        epoch_ms = to_epoch_ms(moment)
+        return epoch_ms - epoch_ms % self.ROLLUP_MS
+    
+    def get_hourly_rollups(self, start_time: datetime = None, end_time: datetime = None,
+                           host: Union[str, Tuple[str, ...]] = None, port: int = None) -> List[Dict]:
         """
-        Get data for chart visualization
+        Get per host/port/hour result counts
+        
+        Each row covers one host and port for one hour: total results,
+        counts per status, and the sum, minimum and maximum response time
+        of the OPEN results. Buckets partly inside the range are included.
+        Rollups are not pruned by cleanup_old_data, so they can reach
+        further back than the raw scan history.
         
         Args:
-            hours: Number of hours to look back (None for all data)
+            start_time: Start of time range (None for all data)
+            end_time: End of time range (None for up to now)
+            host: Filter by host, or a tuple of hosts (optional)
+            port: Filter by port (optional)
             
         Returns:
-            List of scan results for charting
+            List of rollup dictionaries ordered by hour, with hour_start in
+            epoch milliseconds and the local hour of day as hour
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
             
-            if hours:
-                start_time = datetime.now() - timedelta(hours=hours)
-                cursor.execute('''
-                    SELECT timestamp, host, port, status, response_time_ms 
-                    FROM port_scans 
-                    WHERE timestamp >= ?
-                    ORDER BY timestamp ASC
-                ''', (start_time.isoformat(),))
-            else:
-                cursor.execute('''
-                    SELECT timestamp, host, port, status, response_time_ms 
-                    FROM port_scans 
-                    ORDER BY timestamp ASC
-                ''')
+            query = '''
+                SELECT *, CAST(strftime('%H', hour_start / 1000, 'unixepoch', 'localtime') AS INTEGER) AS hour
+                FROM scan_rollups_hourly 
+                WHERE 1=1
+            '''
+            params = []
             
+            if start_time:
+                query += ' AND hour_start >= ?'
+                params.append(self._hour_start(start_time))
+            
+            if end_time:
+                query += ' AND hour_start <= ?'
+                params.append(to_epoch_ms(end_time))
+            
+            if host:
+                condition, value = self._host_condition(host)
+                query += f' AND {condition}'
+                params.append(value)
+            
+            if port:
+                query += ' AND port = ?'
+                params.append(port)
+            
+            query += ' ORDER BY hour_start ASC, host, port'
+            
+            cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
     
     def save_configuration(self, config: Dict):
@@ -318,7 +920,7 @@ class DatabaseManager:
         Args:
             config: Configuration dictionary
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             for key, value in config.items():
@@ -332,7 +934,10 @@ class DatabaseManager:
                 ''', (key, value))
             
             conn.commit()
+        
+        self._bump_generation()
     
+    @_read_through()
     def get_configuration(self) -> Dict:
         """
         Get all configuration settings
@@ -340,9 +945,9 @@ class DatabaseManager:
         Returns:
             Dictionary containing all configuration settings
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._get_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
             
             cursor.execute('SELECT key, value FROM configuration')
             rows = cursor.fetchall()
@@ -374,31 +979,69 @@ class DatabaseManager:
         config = self.get_configuration()
         return config.get(key, default)
     
-    def export_to_csv(self, filename: str, days: int = 7):
+    CSV_FIELDS = ['timestamp', 'host', 'port', 'status', 'response_time_ms', 'error_message']
+    
+    def export_to_csv(self, filename: str, days: int = 7, compress: Optional[bool] = None,
+                      chunk_size: int = 5000,
+                      progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
         """
         Export scan data to CSV file
         
+        Rows are streamed from the cursor chunk_size at a time, selecting
+        only the exported columns, so memory use does not grow with the
+        export size.
+        
         Args:
             filename: Output CSV filename
             days: Number of days to export
+            compress: Write gzip-compressed CSV (defaults to True for a .gz filename)
+            chunk_size: Rows fetched and written per step
+            progress_callback: Called as (rows_written, total_rows) after each chunk
+            
+        Returns:
+            Number of rows exported
         """
         start_time = datetime.now() - timedelta(days=days)
         end_time = datetime.now()
+        params = (to_epoch_ms(start_time), to_epoch_ms(end_time))
+        
+        if compress is None:
+            compress = filename.endswith('.gz')
+        opener = gzip.open if compress else open
         
-        data = self.get_scans_by_timerange(start_time, end_time)
+        conn = self._get_connection()
+        cursor = conn.cursor()
         
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            if not data:
-                return
+        # Index-only count, so the progress callback knows the total
+        cursor.execute('SELECT COUNT(*) FROM port_scans WHERE timestamp BETWEEN ? AND ?', params)
+        total = cursor.fetchone()[0]
+        
+        cursor.execute(f'''
+            SELECT {', '.join(self.CSV_FIELDS)} FROM port_scans 
+            WHERE timestamp BETWEEN ? AND ?
+            ORDER BY timestamp ASC
+        ''', params)
+        
+        written = 0
+        with opener(filename, 'wt', newline='', encoding='utf-8') as csvfile:
+            if not total:
+                return 0
             
-            fieldnames = ['timestamp', 'host', 'port', 'status', 'response_time_ms', 'error_message']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.writer(csvfile)
+            writer.writerow(self.CSV_FIELDS)
             
-            writer.writeheader()
-            for row in data:
-                # Remove protocol_info for CSV export (too complex)
-                csv_row = {k: v for k, v in row.items() if k in fieldnames}
-                writer.writerow(csv_row)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                
+                writer.writerows((to_isoformat(row[0]),) + row[1:] for row in rows)
+                written += len(rows)
+                
+                if progress_callback:
+                    progress_callback(written, max(total, written))
+        
+        return written
     
     def cleanup_old_data(self, days_to_keep: int = 30):
         """
@@ -409,19 +1052,34 @@ class DatabaseManager:
         """
         cutoff_date = datetime.now() - timedelta(days=days_to_keep)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 DELETE FROM port_scans 
                 WHERE timestamp < ?
-            ''', (cutoff_date.isoformat(),))
+            ''', (to_epoch_ms(cutoff_date),))
             
             deleted_count = cursor.rowcount
+            
+            cursor.execute('''
+                DELETE FROM host_outages 
+                WHERE timestamp < ?
+            ''', (to_epoch_ms(cutoff_date),))
+            
+            # Ports not scanned since the cutoff have no history left
+            cursor.execute('''
+                DELETE FROM latest_status 
+                WHERE timestamp < ?
+            ''', (to_epoch_ms(cutoff_date),))
+            
             conn.commit()
+            self._bump_generation()
             
-            # Vacuum to reclaim space
+            # Vacuum to reclaim space, then fold the rewritten pages back
+            # into the database file so the WAL does not keep its size
             cursor.execute('VACUUM')
+            self.checkpoint('TRUNCATE')
             
             return deleted_count
     
@@ -432,7 +1090,7 @@ class DatabaseManager:
         Returns:
             Dictionary containing database statistics
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # Total records
@@ -456,14 +1114,24 @@ class DatabaseManager:
             # Database file size
             file_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
             
+            # Journal and checkpoint state
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            wal_path = self.db_path + '-wal'
+            wal_size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+            
             return {
                 'total_records': total_records,
-                'earliest_record': date_range[0],
-                'latest_record': date_range[1],
+                'earliest_record': to_isoformat(date_range[0]) if date_range[0] is not None else None,
+                'latest_record': to_isoformat(date_range[1]) if date_range[1] is not None else None,
                 'unique_hosts': unique_hosts,
                 'unique_ports': unique_ports,
                 'file_size_bytes': file_size,
-                'file_size_mb': round(file_size / (1024 * 1024), 2)
+                'file_size_mb': round(file_size / (1024 * 1024), 2),
+                'journal_mode': journal_mode,
+                'wal_size_bytes': wal_size,
+                'wal_autocheckpoint_pages': self.WAL_AUTOCHECKPOINT_PAGES,
+                'last_checkpoint': self.last_checkpoint
             }
 
 # Example usage and testing
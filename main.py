@@ -22,7 +22,7 @@ from matplotlib.figure import Figure
 import pandas as pd
 import schedule
 
-from port_scanner import PortScanner
+from port_scanner import PortScanner, RetryPolicy, HostLiveness
 from database import DatabaseManager
 from scheduler import MonitoringScheduler
 from styles import get_application_stylesheet, get_chart_style, get_port_status_colors
@@ -41,11 +41,14 @@ class MainWindow(QMainWindow):
         
         # Initialize components
         self.db_manager = DatabaseManager()
-        self.port_scanner = PortScanner()
+        # Retry timeouts once so a single dropped SYN is not logged as blocking,
+        # and stop probing an unreachable host once it is known to be down
+        self.port_scanner = PortScanner(retry_policy=RetryPolicy(), liveness=HostLiveness())
         self.scheduler = MonitoringScheduler(self.db_manager, self.port_scanner)
         
         # Setup scheduler callbacks
         self.scheduler.set_scan_complete_callback(self.on_scan_complete)
+        self.scheduler.set_scan_result_callback(self.on_scan_result)
         self.scheduler.set_status_update_callback(self.on_status_update)
         
         # Setup UI
@@ -281,18 +284,26 @@ class MainWindow(QMainWindow):
         
         export_layout.addLayout(date_layout)
         
+        self.export_compress = QCheckBox("Compress CSV (gzip)")
+        export_layout.addWidget(self.export_compress)
+        
         # Export buttons
         button_layout = QHBoxLayout()
         
-        csv_button = QPushButton("Export to CSV")
-        csv_button.clicked.connect(self.export_csv)
-        button_layout.addWidget(csv_button)
+        self.csv_button = QPushButton("Export to CSV")
+        self.csv_button.clicked.connect(self.export_csv)
+        button_layout.addWidget(self.csv_button)
         
-        pdf_button = QPushButton("Generate PDF Report")
-        pdf_button.clicked.connect(self.export_pdf)
-        button_layout.addWidget(pdf_button)
+        self.pdf_button = QPushButton("Generate PDF Report")
+        self.pdf_button.clicked.connect(self.export_pdf)
+        button_layout.addWidget(self.pdf_button)
         
         export_layout.addLayout(button_layout)
+        
+        self.export_progress = QProgressBar()
+        self.export_progress.setVisible(False)
+        export_layout.addWidget(self.export_progress)
+        
         layout.addWidget(export_group)
         
         # Export log
@@ -391,19 +402,16 @@ class MainWindow(QMainWindow):
         
     def update_port_table(self):
         """Update the port status table"""
-        recent_scans = self.db_manager.get_recent_scans(limit=50)
-        
-        # Group by port
-        port_status = {}
-        for scan in recent_scans:
-            port = scan['port']
-            if port not in port_status or scan['timestamp'] > port_status[port]['timestamp']:
-                port_status[port] = scan
+        # The target may list several hosts and CIDR blocks
+        latest = self.db_manager.get_latest_status(host=self.scheduler.get_target_hosts())
         
-        self.port_table.setRowCount(len(port_status))
+        self.port_table.setRowCount(len(latest))
+        multi_host = len({scan['host'] for scan in latest}) > 1
         
-        for row, (port, scan) in enumerate(port_status.items()):
-            self.port_table.setItem(row, 0, QTableWidgetItem(str(port)))
+        for row, scan in enumerate(latest):
+            port = scan['port']
+            port_label = f"{scan['host']}:{port}" if multi_host else str(port)
+            self.port_table.setItem(row, 0, QTableWidgetItem(port_label))
             self.port_table.setItem(row, 1, QTableWidgetItem(self.get_protocol_name(port)))
             
             status_item = QTableWidgetItem(scan['status'])
@@ -419,11 +427,8 @@ class MainWindow(QMainWindow):
             self.port_table.setItem(row, 2, status_item)
             
             # Format timestamp nicely
-            try:
-                timestamp = datetime.fromisoformat(scan['timestamp'])
-                formatted_time = timestamp.strftime("%m/%d %H:%M:%S")
-            except:
-                formatted_time = scan['timestamp']
+            timestamp = datetime.fromtimestamp(scan.epoch_ms / 1000)
+            formatted_time = timestamp.strftime("%m/%d %H:%M:%S")
             
             self.port_table.setItem(row, 3, QTableWidgetItem(formatted_time))
         
@@ -511,7 +516,7 @@ class MainWindow(QMainWindow):
         except Exception as e:
             print(f"Error updating scheduler config: {e}")
     
-    def on_scan_complete(self, results):
+    def on_scan_complete(self, summary):
         """Callback when scan completes"""
         try:
             # Update the display
@@ -521,16 +526,21 @@ class MainWindow(QMainWindow):
             scan_time = datetime.now().strftime("%H:%M:%S")
             self.last_scan_label.setText(f"Last Scan: {scan_time}")
             
-            # Count successful scans
-            open_ports = len([r for r in results if r['status'] == 'OPEN'])
-            total_ports = len(results)
-            
-            status_msg = f"Scan completed: {open_ports}/{total_ports} ports open"
+            status_msg = f"Scan completed: {summary['open_ports']}/{summary['total_ports']} ports open"
             self.on_status_update(status_msg)
             
         except Exception as e:
             print(f"Error in scan complete callback: {e}")
     
+    def on_scan_result(self, result):
+        """Callback for each port result while a scan is in progress"""
+        try:
+            self.status_bar.showMessage(
+                f"Port {result['port']}: {result['status']} ({result['response_time_ms']}ms)", 5000
+            )
+        except Exception as e:
+            print(f"Error in scan result callback: {e}")
+    
     def on_status_update(self, message):
         """Callback for status updates"""
         try:
@@ -584,7 +594,8 @@ class MainWindow(QMainWindow):
         else:
             hours = None
             
-        data = self.db_manager.get_chart_data(hours)
+        start_time = datetime.now() - timedelta(hours=hours) if hours else None
+        data = self.db_manager.get_hourly_rollups(start_time)
         
         if data:
             # Create subplots
@@ -597,16 +608,14 @@ class MainWindow(QMainWindow):
             
             # Port availability timeline
             df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            by_port_hour = df.groupby(['port', 'hour'])[['open_count', 'total']].sum()
+            open_fraction = by_port_hour['open_count'] / by_port_hour['total']
             
             # Define colors for different ports
             port_colors = ['#ff8c00', '#38a169', '#e53e3e', '#3182ce', '#9f7aea', '#ed8936', '#48bb78', '#f56565', '#90cdf4']
             
-            for i, port in enumerate(df['port'].unique()):
-                port_data = df[df['port'] == port]
-                success_rate = port_data.groupby(port_data['timestamp'].dt.hour)['status'].apply(
-                    lambda x: (x == 'OPEN').mean() * 100
-                )
+            for i, port in enumerate(open_fraction.index.unique(level='port')):
+                success_rate = open_fraction.loc[port] * 100
                 color = port_colors[i % len(port_colors)]
                 ax1.plot(success_rate.index, success_rate.values, label=f"Port {port}", 
                         marker='o', color=color, linewidth=2, markersize=6)
@@ -618,12 +627,7 @@ class MainWindow(QMainWindow):
             ax1.grid(True, color='#4a5568', alpha=0.3)
             
             # Heatmap of port status by hour
-            pivot_data = df.pivot_table(
-                values='status', 
-                index='port', 
-                columns=df['timestamp'].dt.hour,
-                aggfunc=lambda x: (x == 'OPEN').mean()
-            )
+            pivot_data = open_fraction.unstack('hour')
             
             # Custom colormap for our theme
             from matplotlib.colors import LinearSegmentedColormap
@@ -654,14 +658,34 @@ class MainWindow(QMainWindow):
         try:
             days = self.export_range.value()
             filename = f"port_monitor_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            
-            self.db_manager.export_to_csv(filename, days)
-            self.export_log.append(f"✓ Exported {days} days of data to {filename}")
+            if self.export_compress.isChecked():
+                filename += ".gz"
+            
+            # The progress callback keeps the UI responsive, so block a
+            # second export from starting in the middle of this one
+            self.csv_button.setEnabled(False)
+            self.pdf_button.setEnabled(False)
+            self.export_progress.setValue(0)
+            self.export_progress.setVisible(True)
+            
+            rows = self.db_manager.export_to_csv(filename, days,
+                                                 progress_callback=self.on_export_progress)
+            self.export_log.append(f"✓ Exported {rows} rows ({days} days of data) to {filename}")
             self.on_status_update(f"Data exported to {filename}")
         except Exception as e:
             error_msg = f"✗ Export failed: {str(e)}"
             self.export_log.append(error_msg)
             self.on_status_update(error_msg)
+        finally:
+            self.export_progress.setVisible(False)
+            self.csv_button.setEnabled(True)
+            self.pdf_button.setEnabled(True)
+    
+    def on_export_progress(self, written, total):
+        """Update the export progress bar while a CSV export runs"""
+        self.export_progress.setMaximum(total)
+        self.export_progress.setValue(written)
+        QApplication.processEvents()  # Export runs on the UI thread; keep it repainting
             
     def export_pdf(self):
         """Generate PDF report"""
@@ -677,6 +701,16 @@ class MainWindow(QMainWindow):
             error_msg = f"✗ Report generation failed: {str(e)}"
             self.export_log.append(error_msg)
             self.on_status_update(error_msg)
+    
+    def closeEvent(self, event):
+        """Stop monitoring and release the scanner's worker pool and database connections on exit"""
+        try:
+            self.scheduler.stop_monitoring()
+            self.port_scanner.shutdown(wait=False)
+            self.db_manager.close()
+        except Exception as e:
+            print(f"Error during shutdown: {e}")
+        super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)
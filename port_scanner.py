@@ -3,255 +3,1433 @@ Port Scanner Module
 Handles port scanning functionality for the Comcast Port Monitor
 """
 
+import asyncio
+import errno
+import ipaddress
+import random
+import selectors
 import socket
 import threading
 import time
+import warnings
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import smtplib
-import poplib
-import imaplib
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import ssl
 import requests
-from typing import Dict, List, Tuple, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InsecureRequestWarning
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Tuple, Optional
+
+from probes import ProbeRegistry
+from scan_result import ScanResult
+from targets import TargetSpec
+
+# Address family names stored on results
+_FAMILY_NAMES = {socket.AF_INET: 'IPv4', socket.AF_INET6: 'IPv6'}
+
+def _ip_literal_family(host: str) -> Optional[int]:
+    """Return the address family if a host string is already an IP address"""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return None
+    return socket.AF_INET6 if address.version == 6 else socket.AF_INET
+
+def _interleave_families(addresses: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """
+    Order addresses for connection racing (RFC 8305 section 4)
+    
+    Keeps the resolver's preferred family first and then alternates
+    families, so a broken family costs one attempt delay, not a timeout.
+    """
+    if not addresses:
+        return []
+    
+    first_family = addresses[0][0]
+    preferred = [entry for entry in addresses if entry[0] == first_family]
+    others = [entry for entry in addresses if entry[0] != first_family]
+    
+    ordered = []
+    for pair in zip_longest(preferred, others):
+        ordered.extend(entry for entry in pair if entry is not None)
+    return ordered
+
+class DNSCache:
+    def __init__(self, ttl: float = 300, negative_ttl: float = 30):
+        """
+        Initialize the resolver cache
+        
+        Shared by validate_host, scan_port and the protocol probes so a scan
+        cycle resolves each host once instead of once per port.
+        
+        Args:
+            ttl: Seconds a successful lookup is reused
+            negative_ttl: Seconds a failed lookup is remembered
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = {}  # host -> (address list or gaierror, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_cached(self, host: str) -> Optional[List[Tuple[int, str]]]:
+        """
+        Return cached addresses without doing a lookup
+        
+        Args:
+            host: Hostname or IP address
+            
+        Returns:
+            Cached (family, address) list, or None if the host is not cached
+            
+        Raises:
+            socket.gaierror: If a failed lookup for the host is cached
+        """
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None:
+                return None
+            
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[host]
+                return None
+            
+            self.hits += 1
+        
+        if isinstance(value, socket.gaierror):
+            raise value
+        return value
+    
+    def resolve_all(self, host: str) -> List[Tuple[int, str]]:
+        """
+        Resolve a hostname to its IPv6 and IPv4 addresses, using the cache when possible
+        
+        Args:
+            host: Hostname or IP address
+            
+        Returns:
+            (family, address) tuples in connection racing order
+            
+        Raises:
+            socket.gaierror: If the host cannot be resolved
+        """
+        family = _ip_literal_family(host)
+        if family is not None:
+            return [(family, host)]
+        
+        addresses = self.get_cached(host)
+        if addresses is not None:
+            return addresses
+        
+        with self._lock:
+            self.misses += 1
+        
+        try:
+            addrinfo = socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            with self._lock:
+                self._entries[host] = (e, time.monotonic() + self.negative_ttl)
+            raise
+        
+        unique = []
+        for family, _, _, _, sockaddr in addrinfo:
+            entry = (family, sockaddr[0])
+            if family in _FAMILY_NAMES and entry not in unique:
+                unique.append(entry)
+        if not unique:
+            raise socket.gaierror(socket.EAI_NONAME, f'No IPv4 or IPv6 address for {host}')
+        
+        addresses = _interleave_families(unique)
+        with self._lock:
+            self._entries[host] = (addresses, time.monotonic() + self.ttl)
+        return addresses
+    
+    def resolve(self, host: str) -> str:
+        """
+        Resolve a hostname to its preferred address, using the cache when possible
+        
+        Args:
+            host: Hostname or IP address
+            
+        Returns:
+            IP address string
+            
+        Raises:
+            socket.gaierror: If the host cannot be resolved
+        """
+        return self.resolve_all(host)[0][1]
+    
+    def invalidate(self, host: str = None):
+        """Drop one host (or every host) from the cache"""
+        with self._lock:
+            if host is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(host, None)
+    
+    def get_stats(self) -> Dict:
+        """Get cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# connect_ex() reports a timed-out connect as one of these instead of raising
+_CONNECT_TIMEOUT_ERRNOS = {
+    errno.EAGAIN, errno.EWOULDBLOCK, errno.ETIMEDOUT,
+    getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK),
+    getattr(errno, 'WSAETIMEDOUT', errno.ETIMEDOUT)
+}
+
+# Non-blocking connect_ex() results meaning the handshake is under way
+_CONNECT_PENDING_ERRNOS = {
+    errno.EINPROGRESS, errno.EAGAIN, errno.EWOULDBLOCK,
+    getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)
+}
+
+def _pick_connect_failure(failures: List[Tuple[int, int, str]]) -> Tuple[int, int, str]:
+    """
+    Choose which failed attempt of a connection race to report
+    
+    A refusal from any address means the host answered, so it wins over
+    timeouts; otherwise the last failure is reported.
+    
+    Args:
+        failures: (errno, family, address) for each failed attempt
+    
+    Returns:
+        The (errno, family, address) to record on the result
+    """
+    for failure in failures:
+        if failure[0] == errno.ECONNREFUSED:
+            return failure
+    return failures[-1]
+
+class AdaptiveTimeout:
+    # Initial retransmission timeout the kernel waits before resending a SYN
+    # (RFC 6298 section 2.1; Linux TCP_TIMEOUT_INIT)
+    SYN_RETRANSMIT_TIMEOUT = 1.0
+    
+    def __init__(self, initial_timeout: float = 10, min_timeout: float = 1.0,
+                 max_timeout: float = 10):
+        """
+        Initialize the per-host adaptive timeout estimator
+        
+        Keeps a smoothed RTT and RTT variance per host (the RFC 6298
+        estimator nmap uses) and derives the connect timeout as
+        srtt + 4 * rttvar, clamped to [min_timeout, max_timeout]. Hosts
+        without samples use initial_timeout. A connect that times out
+        doubles the host's timeout until the next RTT sample (RFC 6298
+        section 5.5), so a path that got slower than the estimate is
+        relearned instead of reading as TIMEOUT forever.
+        
+        The derived timeout never drops below SYN_RETRANSMIT_TIMEOUT plus
+        two smoothed RTTs: the retransmitted SYN leaves after about a second
+        and its answer needs another round trip, so a single dropped SYN is
+        not a TIMEOUT.
+        
+        Args:
+            initial_timeout: Timeout in seconds before a host has any samples
+            min_timeout: Lower bound in seconds for the derived timeout
+            max_timeout: Upper bound in seconds for the derived timeout
+        """
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._hosts = {}  # host -> [srtt, rttvar, samples]
+        self._backoff = {}  # host -> backed-off timeout after a connect timeout
+        self._lock = threading.Lock()
+    
+    def record_rtt(self, host: str, rtt: float):
+        """
+        Feed a measured connect RTT for a host
+        
+        Args:
+            host: Target hostname or IP address
+            rtt: Round-trip time in seconds
+        """
+        with self._lock:
+            # A fresh sample replaces any backed-off timeout (RFC 6298 5.7)
+            self._backoff.pop(host, None)
+            
+            state = self._hosts.get(host)
+            if state is None:
+                self._hosts[host] = [rtt, rtt / 2, 1]
+                return
+            
+            srtt, rttvar, samples = state
+            rttvar = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+            srtt = 0.875 * srtt + 0.125 * rtt
+            self._hosts[host] = [srtt, rttvar, samples + 1]
+    
+    def record_timeout(self, host: str, timeout: float):
+        """
+        Back off after a connect to a host timed out
+        
+        The next timeout is twice the one that expired, up to max_timeout.
+        Ports timing out concurrently with the same timeout back off once,
+        not once per port.
+        
+        Args:
+            host: Target hostname or IP address
+            timeout: Timeout in seconds the failed connect used
+        """
+        with self._lock:
+            backed_off = min(self.max_timeout, timeout * 2)
+            if backed_off > self._backoff.get(host, 0):
+                self._backoff[host] = backed_off
+    
+    def get_timeout(self, host: str) -> float:
+        """
+        Get the connect timeout to use for a host
+        
+        Args:
+            host: Target hostname or IP address
+            
+        Returns:
+            Timeout in seconds
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            backed_off = self._backoff.get(host, 0)
+        
+        if state is None:
+            return self.initial_timeout
+        
+        srtt, rttvar, _ = state
+        floor = max(self.min_timeout, self.SYN_RETRANSMIT_TIMEOUT + 2 * srtt)
+        return min(self.max_timeout, max(floor, srtt + 4 * rttvar, backed_off))
+    
+    def get_stats(self) -> Dict:
+        """Get the current estimate for every host, in milliseconds"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        
+        return {
+            host: {
+                'srtt_ms': round(srtt * 1000, 2),
+                'rttvar_ms': round(rttvar * 1000, 2),
+                'samples': samples,
+                'timeout_ms': round(self.get_timeout(host) * 1000, 2)
+            }
+            for host, (srtt, rttvar, samples) in hosts.items()
+        }
+    
+    def reset(self, host: str = None):
+        """Forget the estimate for one host (or every host)"""
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+class PhaseTimer:
+    """
+    Monotonic, microsecond-resolution timings for the phases of one probe
+    
+    dns_us and connect_us cover resolution and the TCP handshake.
+    tls_handshake_us is the total time spent in TLS handshakes (including
+    STARTTLS). first_byte_us and protocol_us are measured from connected()
+    - the moment the protocol probe starts on the connected socket - to the
+    first response line and to the end of the protocol probe.
+    """
+    
+    __slots__ = ('dns_us', 'connect_us', 'tls_handshake_us', 'first_byte_us',
+                 'protocol_us', '_connected_at')
+    
+    def __init__(self):
+        self.dns_us = None
+        self.connect_us = None
+        self.tls_handshake_us = None
+        self.first_byte_us = None
+        self.protocol_us = None
+        self._connected_at = None
+    
+    @staticmethod
+    def now() -> int:
+        """Current monotonic time in nanoseconds"""
+        return time.perf_counter_ns()
+    
+    @staticmethod
+    def since(start_ns: int) -> int:
+        """Microseconds elapsed since a now() value"""
+        return (time.perf_counter_ns() - start_ns) // 1000
+    
+    def connected(self):
+        """Mark the end of the TCP handshake"""
+        self._connected_at = time.perf_counter_ns()
+    
+    def add_tls(self, start_ns: int):
+        """Add a finished TLS handshake that began at start_ns"""
+        self.tls_handshake_us = (self.tls_handshake_us or 0) + self.since(start_ns)
+    
+    def first_byte(self):
+        """Mark the first response line (only the first call counts)"""
+        if self.first_byte_us is None and self._connected_at is not None:
+            self.first_byte_us = self.since(self._connected_at)
+    
+    def protocol_done(self):
+        """Mark the end of the protocol probe"""
+        if self._connected_at is not None:
+            self.protocol_us = self.since(self._connected_at)
+    
+    def response_time_ms(self) -> int:
+        """DNS plus connect time, rounded to whole milliseconds"""
+        return round(((self.dns_us or 0) + (self.connect_us or 0)) / 1000)
+    
+    def as_dict(self) -> Dict:
+        """Phase durations keyed as in ScanResult"""
+        return {
+            'dns_us': self.dns_us,
+            'connect_us': self.connect_us,
+            'tls_handshake_us': self.tls_handshake_us,
+            'first_byte_us': self.first_byte_us,
+            'protocol_us': self.protocol_us
+        }
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None):
+        """
+        Initialize a token bucket
+        
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity (defaults to one second of tokens)
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+    
+    def reserve(self, now: float) -> float:
+        """
+        Take one token, going into debt if the bucket is empty
+        
+        Not thread-safe; RateLimiter serializes access.
+        
+        Args:
+            now: Current time.monotonic() value
+            
+        Returns:
+            Seconds the caller must wait before using the token
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+    
+    def is_idle(self, now: float) -> bool:
+        """Check whether the bucket would be full again by now"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+class RateLimiter:
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 per_host_rate: Optional[float] = None, per_host_burst: Optional[float] = None):
+        """
+        Initialize the connect rate limiter
+        
+        Every connection attempt takes a token from a global bucket and from
+        its host's bucket, and waits until both allow it. Either limit can
+        be left as None to disable it.
+        
+        Args:
+            rate: Global connects per second
+            burst: Global burst size (connects allowed back to back)
+            per_host_rate: Connects per second to any single host
+            per_host_burst: Per-host burst size
+        """
+        self.global_bucket = TokenBucket(rate, burst) if rate else None
+        self.per_host_rate = per_host_rate
+        self.per_host_burst = per_host_burst
+        self._host_buckets = {}
+        self._lock = threading.Lock()
+        
+        # Wait statistics
+        self.acquired = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def reserve(self, host: str) -> float:
+        """
+        Reserve a connect slot for a host without sleeping
+        
+        Args:
+            host: Target hostname or IP address
+            
+        Returns:
+            Seconds the caller must wait before connecting
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            
+            if self.global_bucket is not None:
+                delay = self.global_bucket.reserve(now)
+            
+            if self.per_host_rate:
+                bucket = self._host_buckets.get(host)
+                if bucket is None:
+                    # Keep the table bounded on large sweeps
+                    if len(self._host_buckets) >= 4096:
+                        self._prune(now)
+                    bucket = TokenBucket(self.per_host_rate, self.per_host_burst)
+                    self._host_buckets[host] = bucket
+                delay = max(delay, bucket.reserve(now))
+            
+            self.acquired += 1
+            if delay > 0:
+                self.delayed += 1
+                self.total_wait += delay
+                self.max_wait = max(self.max_wait, delay)
+            
+            return delay
+    
+    def acquire(self, host: str) -> float:
+        """
+        Block until a connect to the host is allowed
+        
+        Args:
+            host: Target hostname or IP address
+            
+        Returns:
+            Seconds spent waiting
+        """
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+    
+    async def acquire_async(self, host: str) -> float:
+        """Event-loop version of acquire()"""
+        delay = self.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+    
+    def _prune(self, now: float):
+        """Drop per-host buckets that have refilled completely"""
+        idle = [host for host, bucket in self._host_buckets.items() if bucket.is_idle(now)]
+        for host in idle:
+            del self._host_buckets[host]
+    
+    def get_stats(self) -> Dict:
+        """
+        Get rate limiter wait statistics
+        
+        Returns:
+            Dictionary with attempt counts and wait times in milliseconds
+        """
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'delayed': self.delayed,
+                'total_wait_ms': round(self.total_wait * 1000, 2),
+                'avg_wait_ms': round(self.total_wait * 1000 / self.acquired, 2) if self.acquired else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'tracked_hosts': len(self._host_buckets)
+            }
+
+class RetryBudget:
+    def __init__(self, limit: Optional[int] = None):
+        """
+        Initialize a retry budget shared by the probes of one scan cycle
+        
+        Args:
+            limit: Maximum number of retries for the cycle (None = unlimited)
+        """
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+    
+    def take(self) -> bool:
+        """Consume one retry; returns False once the budget is spent"""
+        with self._lock:
+            if self.limit is not None and self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 2, base_delay: float = 0.5,
+                 max_delay: float = 5.0, jitter: float = 0.5,
+                 retry_statuses: Tuple[str, ...] = ('TIMEOUT',),
+                 cycle_budget: Optional[int] = 10):
+        """
+        Initialize the retry policy
+        
+        A single dropped SYN shows up as a TIMEOUT. Retrying it after a short,
+        jittered backoff separates transient loss from real blocking, while
+        the per-cycle budget keeps the extra probes bounded when a host is
+        genuinely filtered.
+        
+        Args:
+            max_attempts: Total attempts per port, including the first
+            base_delay: Backoff before the first retry in seconds
+            max_delay: Upper bound for the backoff in seconds
+            jitter: Random fraction (0-1) subtracted from each backoff
+            retry_statuses: Result statuses that trigger a retry
+            cycle_budget: Maximum retries per scan cycle (None = unlimited)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+        self.cycle_budget = cycle_budget
+    
+    def new_budget(self) -> RetryBudget:
+        """Create the retry budget for one scan cycle"""
+        return RetryBudget(self.cycle_budget)
+    
+    def should_retry(self, result: ScanResult, attempt: int) -> bool:
+        """Check whether a result is worth another attempt"""
+        return attempt < self.max_attempts and result['status'] in self.retry_statuses
+    
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before the next attempt: exponential with jitter
+        
+        Args:
+            attempt: Number of attempts made so far (1 for the first retry)
+            
+        Returns:
+            Delay in seconds
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter * random.random())
+
+class HostLiveness:
+    def __init__(self, timeout_threshold: int = 3):
+        """
+        Initialize host-down detection
+        
+        A host whose first timeout_threshold results in a cycle are all
+        TIMEOUTs, with no reply of any kind, is suspected down. If a port
+        that was OPEN on an earlier cycle still answers, the timeouts are
+        real (e.g. filtered ports); otherwise the host is declared down and
+        its remaining probes are cancelled. Ports that were actually probed
+        keep their TIMEOUT results, flagged in error_message as timed out
+        because the host was down, so history and the dashboard show the
+        outage. Ports that were never probed get no rows: one outage event
+        per host records how many were skipped, which keeps the storage and
+        memory cost of an outage independent of the number of ports.
+        
+        Args:
+            timeout_threshold: Timeouts without any reply before a host is suspected
+        """
+        self.timeout_threshold = timeout_threshold
+        self._known_open = {}  # host -> port that answered most recently
+        self._lock = threading.Lock()
+    
+    def new_cycle(self) -> 'LivenessCycle':
+        """Create the per-cycle tracker used by one scan"""
+        return LivenessCycle(self)
+    
+    def remember_open(self, host: str, port: int):
+        """Record a port that answered, for confirming the host on later cycles"""
+        with self._lock:
+            self._known_open[host] = port
+    
+    def known_open_port(self, host: str) -> Optional[int]:
+        """Get the port that most recently answered on a host"""
+        with self._lock:
+            return self._known_open.get(host)
+
+class LivenessCycle:
+    # error_message of the TIMEOUT results of a host declared down
+    TIMED_OUT_MESSAGE = 'Connection timeout (host down)'
+    
+    def __init__(self, liveness: HostLiveness):
+        """
+        Track host liveness across the results of one scan cycle
+        
+        Args:
+            liveness: Shared HostLiveness holding the threshold and known-open ports
+        """
+        self.liveness = liveness
+        self.outages = {}   # host -> outage event
+        self._held = {}     # host -> TIMEOUT results not yet released
+        self._alive = set()
+    
+    def is_down(self, host: str) -> bool:
+        """Check whether a host was declared down this cycle"""
+        return host in self.outages
+    
+    def observe(self, result: ScanResult) -> List[ScanResult]:
+        """
+        Feed one result to the tracker
+        
+        TIMEOUTs from hosts that have not replied yet are held back until
+        the host is confirmed alive or declared down.
+        
+        Returns:
+            Results that can be reported now
+        """
+        host = result['host']
+        if result['status'] in ('OPEN', 'CLOSED'):
+            if result['status'] == 'OPEN':
+                self.liveness.remember_open(host, result['port'])
+            if host in self.outages:
+                # Came back before the cycle ended; keep the real result
+                return [result]
+            self._alive.add(host)
+            return self._held.pop(host, []) + [result]
+        
+        if result['status'] == 'TIMEOUT' and host not in self._alive:
+            if host in self.outages:
+                self.outages[host]['ports_timed_out'].append(result['port'])
+                result['error_message'] = self.TIMED_OUT_MESSAGE
+                return [result]
+            self._held.setdefault(host, []).append(result)
+            return []
+        
+        return [result]
+    
+    def suspects(self) -> List[str]:
+        """Hosts that reached the timeout threshold and need a liveness check"""
+        return [host for host, held in self._held.items()
+                if len(held) >= self.liveness.timeout_threshold]
+    
+    def confirm_alive(self, host: str) -> List[ScanResult]:
+        """Mark a suspect host alive and release its held TIMEOUTs"""
+        self._alive.add(host)
+        return self._held.pop(host, [])
+    
+    def mark_down(self, host: str, reason: str) -> List[ScanResult]:
+        """
+        Declare a suspect host down and record an outage event for it
+        
+        Returns:
+            The host's held TIMEOUTs, flagged as timed out because the host was down
+        """
+        held = self._held.pop(host, [])
+        self.outages[host] = {
+            'host': host,
+            'timestamp': held[0]['timestamp'] if held else datetime.now().isoformat(),
+            'reason': reason,
+            'ports_timed_out': [result['port'] for result in held],
+            'ports_skipped': 0
+        }
+        for result in held:
+            result['error_message'] = self.TIMED_OUT_MESSAGE
+        return held
+    
+    def skip(self, host: str, port: int):
+        """Count a probe that was not run because its host is down"""
+        self.outages[host]['ports_skipped'] += 1
+    
+    def interrupted(self, host: str, port: int) -> ScanResult:
+        """
+        Record a probe of a down host that was cancelled while in progress
+        
+        Returns:
+            A TIMEOUT result for the port, flagged as timed out because the
+            host was down
+        """
+        result = ScanResult(host, port, status='TIMEOUT', error_message=self.TIMED_OUT_MESSAGE)
+        self.outages[host]['ports_timed_out'].append(port)
+        return result
+    
+    def finish(self) -> List[ScanResult]:
+        """Release the TIMEOUTs of hosts that never reached the threshold"""
+        released = [result for held in self._held.values() for result in held]
+        self._held.clear()
+        return released
+
+class _TrackingSemaphore(asyncio.Semaphore):
+    """Semaphore that remembers which tasks have acquired it at least once"""
+    
+    def __init__(self, value: int):
+        super().__init__(value)
+        self._started = set()
+    
+    async def acquire(self):
+        await super().acquire()
+        self._started.add(asyncio.current_task())
+        return True
+    
+    def forget(self, task: asyncio.Task) -> bool:
+        """Stop tracking a task; returns whether it had started probing"""
+        if task in self._started:
+            self._started.discard(task)
+            return True
+        return False
+
+class _TrackedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that keeps queued/active counters for saturation stats"""
+    
+    def __init__(self, max_workers: int, thread_name_prefix: str = ''):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.peak_active = 0
+        self.submitted = 0
+        self.completed = 0
+    
+    def submit(self, fn, /, *args, **kwargs):
+        with self._stats_lock:
+            self.queued += 1
+            self.submitted += 1
+        
+        def run():
+            with self._stats_lock:
+                self.queued -= 1
+                self.active += 1
+                self.peak_active = max(self.peak_active, self.active)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+                    self.completed += 1
+        
+        try:
+            return super().submit(run)
+        except RuntimeError:
+            with self._stats_lock:
+                self.queued -= 1
+                self.submitted -= 1
+            raise
 
 class PortScanner:
-    def __init__(self, timeout: int = 10, max_workers: int = 10):
+    def __init__(self, timeout: int = 10, max_workers: int = 10,
+                 resolver: Optional[DNSCache] = None,
+                 adaptive_timeout: bool = True, min_timeout: float = 1.0,
+                 rate_limiter: Optional[RateLimiter] = None, http_probe: str = 'socket',
+                 retry_policy: Optional[RetryPolicy] = None, probes: Optional[ProbeRegistry] = None,
+                 liveness: Optional[HostLiveness] = None):
         """
         Initialize the port scanner
         
         Args:
-            timeout: Connection timeout in seconds
-            max_workers: Maximum number of concurrent scanning threads
+            timeout: Connection timeout in seconds (upper bound when adaptive)
+            max_workers: Maximum number of concurrent scanning threads,
+                shared by every scan running on this scanner
+            resolver: DNS cache to use (a private one is created by default)
+            adaptive_timeout: Derive per-host connect timeouts from measured RTT
+            min_timeout: Lower bound in seconds for adaptive connect timeouts
+            rate_limiter: Optional limiter for outbound connects per second
+            http_probe: 'socket' sends a raw HEAD on the probe connection;
+                'session' uses a pooled requests session that follows redirects
+            retry_policy: Optional policy for retrying TIMEOUT results
+            probes: Protocol probes run on open ports (defaults to the
+                built-in banner probes, see probes.ProbeRegistry.default)
+            liveness: Optional host-down detection that cancels the rest of
+                a cycle's probes to an unreachable host
+        """
+        if http_probe not in ('socket', 'session'):
+            raise ValueError(f"http_probe must be 'socket' or 'session', not {http_probe!r}")
+        
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.resolver = resolver if resolver is not None else DNSCache()
+        self.adaptive_timeout = adaptive_timeout
+        self.rtt_estimator = AdaptiveTimeout(
+            initial_timeout=timeout, min_timeout=min(min_timeout, timeout), max_timeout=timeout
+        )
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.probes = probes if probes is not None else ProbeRegistry.default()
+        self.liveness = liveness
+        self.host_down_callback = None
+        
+        # One TLS context per scanner, plus sessions kept per host:port so
+        # later cycles resume instead of doing a full handshake
+        self._ssl_context = None
+        self._tls_sessions = {}
+        self._tls_lock = threading.Lock()
+        self.max_tls_sessions = 1024
+        self.tls_handshakes = 0
+        self.tls_resumed = 0
+        
+        # Pooled HTTP session for http_probe='session', created on first use
+        self.http_probe = http_probe
+        self.http_pool_hosts = 64
+        self.http_pool_per_host = 2
+        self._http_session = None
+        
+        # Happy eyeballs: wait this long for an attempt before racing the
+        # next address (RFC 8305 Connection Attempt Delay)
+        self.connection_attempt_delay = 0.25
+        
+        # Long-lived worker pool, created by start() and reused across cycles
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    def start(self):
+        """Create the worker pool (called automatically by the first scan)"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = _TrackedExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='port-scan'
+                )
+    
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the worker pool
+        
+        Args:
+            wait: Block until running probes have finished
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            http_session, self._http_session = self._http_session, None
+        
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        
+        if http_session is not None:
+            http_session.close()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the shared worker pool, starting it if needed"""
+        executor = self._executor
+        if executor is None:
+            self.start()
+            executor = self._executor
+        return executor
+    
+    def get_pool_stats(self) -> Dict:
+        """
+        Get worker pool saturation statistics
+        
+        Returns:
+            Dictionary with pool size, active/queued probes and totals
+        """
+        executor = self._executor
+        if executor is None:
+            return {
+                'running': False,
+                'max_workers': self.max_workers,
+                'active': 0,
+                'queued': 0,
+                'peak_active': 0,
+                'submitted': 0,
+                'completed': 0,
+                'utilization': 0.0
+            }
+        
+        with executor._stats_lock:
+            return {
+                'running': True,
+                'max_workers': self.max_workers,
+                'active': executor.active,
+                'queued': executor.queued,
+                'peak_active': executor.peak_active,
+                'submitted': executor.submitted,
+                'completed': executor.completed,
+                'utilization': executor.active / self.max_workers
+            }
+        
+    def scan_port(self, host: str, port: int, retry_budget: Optional[RetryBudget] = None) -> ScanResult:
+        """
+        Scan a single port and return detailed results
+        
+        Args:
+            host: Target hostname or IP address
+            port: Port number to scan
+            retry_budget: Budget shared by the probes of one cycle
+                (a fresh one from the retry policy if omitted)
+            
+        Returns:
+            ScanResult for the port
+        """
+        result = self._probe_port(host, port)
+        if self.retry_policy is None:
+            return result
+        
+        if retry_budget is None:
+            retry_budget = self.retry_policy.new_budget()
+        
+        attempt = 1
+        while self.retry_policy.should_retry(result, attempt) and retry_budget.take():
+            time.sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+            result = self._probe_port(host, port)
+        
+        result['attempts'] = attempt
+        return result
+    
+    def _probe_port(self, host: str, port: int) -> ScanResult:
+        """Make a single connection attempt (plus protocol probe) to a port"""
+        result = self._new_result(host, port)
+        timer = PhaseTimer()
+        
+        try:
+            # Connect to the cached addresses so each port does not re-resolve
+            dns_start = timer.now()
+            addresses = self.resolver.resolve_all(host)
+            timer.dns_us = timer.since(dns_start)
+            
+            # Wait for the rate limiter outside the measured phases
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(host)
+            
+            # Basic TCP connection test, racing IPv6 and IPv4 addresses
+            connect_timeout = self.get_connect_timeout(host)
+            connect_start = timer.now()
+            sock, connection_result, family, address = self._connect_race(addresses, port, connect_timeout)
+            timer.connect_us = timer.since(connect_start)
+            result['address_family'] = _FAMILY_NAMES.get(family)
+            result['address'] = address
+            
+            if connection_result == 0:
+                timer.connected()
+                result['status'] = 'OPEN'
+                result['response_time_ms'] = timer.response_time_ms()
+                self._record_rtt(host, timer.connect_us / 1_000_000)
+                
+                # Protocol probes get the full timeout; only the connect is adaptive
+                sock.settimeout(self.timeout)
+                
+                # Try protocol-specific testing
+                protocol_info = self._test_protocol(host, port, sock, timer)
+                if protocol_info:
+                    result['protocol_info'] = protocol_info
+                    timer.protocol_done()
+                    
+            elif connection_result in _CONNECT_TIMEOUT_ERRNOS:
+                result['status'] = 'TIMEOUT'
+                result['response_time_ms'] = int(connect_timeout * 1000)
+                result['error_message'] = 'Connection timeout'
+                self._record_timeout(host, connect_timeout)
+                
+            else:
+                result['status'] = 'CLOSED'
+                result['response_time_ms'] = timer.response_time_ms()
+                if connection_result == errno.ECONNREFUSED:
+                    # A RST is still a full round trip
+                    self._record_rtt(host, timer.connect_us / 1_000_000)
+            
+            if sock is not None:
+                sock.close()
+            
+        except socket.timeout:
+            result['status'] = 'TIMEOUT'
+            result['response_time_ms'] = int(self.timeout * 1000)
+            result['error_message'] = 'Connection timeout'
+            
+        except socket.gaierror as e:
+            result['status'] = 'ERROR'
+            result['error_message'] = f'DNS resolution failed: {str(e)}'
+            
+        except Exception as e:
+            result['status'] = 'ERROR'
+            result['error_message'] = str(e)
+        
+        result.update(timer.as_dict())
+        return result
+    
+    def _new_result(self, host: str, port: int) -> ScanResult:
+        """Build an empty result record for a probe"""
+        return ScanResult(host, port)
+    
+    def _connect_race(self, addresses: List[Tuple[int, str]], port: int,
+                      timeout: float) -> Tuple[Optional[socket.socket], int, int, str]:
+        """
+        Connect to the first address that answers (RFC 8305 happy eyeballs)
+        
+        Attempts start connection_attempt_delay apart, or as soon as the
+        previous one fails, and each gets the full connect timeout. The
+        first to complete wins and the rest are abandoned.
+        
+        Args:
+            addresses: (family, address) tuples in racing order
+            port: Port number
+            timeout: Connect timeout per attempt in seconds
+            
+        Returns:
+            (socket, errno, family, address) - the connected socket and 0 for
+            the winner, or None and the reported errno if every attempt failed
+        """
+        selector = selectors.DefaultSelector()
+        pending = {}  # socket -> (family, address, deadline)
+        failures = []
+        remaining = list(addresses)
+        next_start = time.monotonic()
+        
+        try:
+            while remaining or pending:
+                now = time.monotonic()
+                
+                if remaining and now >= next_start:
+                    family, address = remaining.pop(0)
+                    try:
+                        sock = socket.socket(family, socket.SOCK_STREAM)
+                    except OSError as e:
+                        # e.g. no IPv6 stack on this machine
+                        failures.append((e.errno, family, address))
+                        continue
+                    
+                    sock.setblocking(False)
+                    code = sock.connect_ex((address, port))
+                    if code == 0:
+                        return sock, 0, family, address
+                    if code not in _CONNECT_PENDING_ERRNOS:
+                        sock.close()
+                        failures.append((code, family, address))
+                        continue
+                    
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    pending[sock] = (family, address, now + timeout)
+                    next_start = now + self.connection_attempt_delay
+                    continue
+                
+                # Wake for the next attempt deadline or the next start,
+                # whichever comes first (pending may be empty between starts)
+                wake_times = [deadline for _, _, deadline in pending.values()]
+                if remaining:
+                    wake_times.append(next_start)
+                wake_at = min(wake_times)
+                
+                for key, _ in selector.select(max(0.0, wake_at - now)):
+                    sock = key.fileobj
+                    family, address, _ = pending.pop(sock)
+                    selector.unregister(sock)
+                    
+                    code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if code == 0:
+                        return sock, 0, family, address
+                    
+                    sock.close()
+                    failures.append((code, family, address))
+                    next_start = time.monotonic()  # start the next one now
+                
+                now = time.monotonic()
+                for sock, (family, address, deadline) in list(pending.items()):
+                    if now >= deadline:
+                        del pending[sock]
+                        selector.unregister(sock)
+                        sock.close()
+                        failures.append((errno.ETIMEDOUT, family, address))
+                        next_start = now  # start the next one now
+        finally:
+            for sock in pending:
+                sock.close()
+            selector.close()
+        
+        code, family, address = _pick_connect_failure(failures)
+        return None, code, family, address
+    
+    def get_connect_timeout(self, host: str) -> float:
+        """
+        Get the connect timeout for a host
+        
+        Args:
+            host: Target hostname or IP address
+            
+        Returns:
+            Timeout in seconds (adaptive if enabled, otherwise self.timeout)
+        """
+        if not self.adaptive_timeout:
+            return self.timeout
+        return self.rtt_estimator.get_timeout(host)
+    
+    def get_rate_limit_stats(self) -> Optional[Dict]:
+        """Get rate limiter wait statistics (None if rate limiting is off)"""
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.get_stats()
+    
+    def _record_rtt(self, host: str, rtt: float):
+        """Feed a connect RTT sample to the adaptive timeout estimator"""
+        if self.adaptive_timeout:
+            self.rtt_estimator.record_rtt(host, rtt)
+    
+    def _record_timeout(self, host: str, timeout: float):
+        """Tell the adaptive timeout estimator a connect timed out"""
+        if self.adaptive_timeout:
+            self.rtt_estimator.record_timeout(host, timeout)
+    
+    def scan_multiple_ports(self, host: str, ports: List[int]) -> List[ScanResult]:
+        """
+        Scan multiple ports concurrently
+        
+        Args:
+            host: Target hostname or IP address
+            ports: List of port numbers to scan
+            
+        Returns:
+            List of scan results
+        """
+        results = list(self.scan_iter(host, ports))
+        
+        # Sort results by port number
+        results.sort(key=lambda x: x['port'])
+        return results
+    
+    def scan_iter(self, host: str, ports: Iterable[int]) -> Iterator[ScanResult]:
+        """
+        Scan multiple ports concurrently, yielding each result as it completes
+        
+        Probes run on the scanner's shared worker pool, so concurrent calls
+        (e.g. a manual scan during a scheduled one) share one concurrency
+        budget. Only about two probes per worker are submitted at a time, so
+        memory stays flat however many ports are passed in.
+        
+        Args:
+            host: Target hostname or IP address
+            ports: Port numbers to scan (any iterable, consumed lazily)
+            
+        Yields:
+            ScanResult records in completion order
         """
-        self.timeout = timeout
-        self.max_workers = max_workers
-        
-    def scan_port(self, host: str, port: int) -> Dict:
+        return self._scan_pairs((host, port) for port in ports)
+    
+    def scan_targets(self, targets: TargetSpec) -> Iterator[ScanResult]:
         """
-        Scan a single port and return detailed results
+        Scan every (host, port) pair of a target specification
+        
+        Pairs are generated lazily and hosts are interleaved, so large sweeps
+        (e.g. 10.0.0.0/22 x 1-1024) run with flat memory and spread load
+        across hosts.
         
         Args:
-            host: Target hostname or IP address
-            port: Port number to scan
+            targets: TargetSpec describing hosts, CIDR blocks and port ranges
             
-        Returns:
-            Dictionary containing scan results
+        Yields:
+            ScanResult records in completion order
         """
-        start_time = time.time()
-        result = {
-            'host': host,
-            'port': port,
-            'status': 'UNKNOWN',
-            'response_time_ms': 0,
-            'timestamp': datetime.now().isoformat(),
-            'error_message': None,
-            'protocol_info': None
-        }
+        return self._scan_pairs(iter(targets))
+    
+    def _scan_pairs(self, pairs: Iterator[Tuple[str, int]]) -> Iterator[ScanResult]:
+        """Run scan_port over (host, port) pairs with a bounded in-flight window"""
+        executor = self._get_executor()
+        max_in_flight = self.max_workers * 2
+        future_to_target = {}
+        retry_budget = self.retry_policy.new_budget() if self.retry_policy else None
+        cycle = self.liveness.new_cycle() if self.liveness else None
+        pairs = self._skip_down_hosts(pairs, cycle)
         
         try:
-            # Basic TCP connection test
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.timeout)
-            
-            connection_result = sock.connect_ex((host, port))
-            response_time = (time.time() - start_time) * 1000
-            
-            if connection_result == 0:
-                result['status'] = 'OPEN'
-                result['response_time_ms'] = int(response_time)
+            while True:
+                # Top up the in-flight window
+                for host, port in pairs:
+                    future_to_target[executor.submit(self.scan_port, host, port, retry_budget)] = (host, port)
+                    if len(future_to_target) >= max_in_flight:
+                        break
                 
-                # Try protocol-specific testing
-                protocol_info = self._test_protocol(host, port, sock)
-                if protocol_info:
-                    result['protocol_info'] = protocol_info
-                    
-            else:
-                result['status'] = 'CLOSED'
-                result['response_time_ms'] = int(response_time)
+                if not future_to_target:
+                    break
                 
-            sock.close()
-            
-        except socket.timeout:
-            result['status'] = 'TIMEOUT'
-            result['response_time_ms'] = self.timeout * 1000
-            result['error_message'] = 'Connection timeout'
-            
-        except socket.gaierror as e:
-            result['status'] = 'ERROR'
-            result['error_message'] = f'DNS resolution failed: {str(e)}'
-            
-        except Exception as e:
-            result['status'] = 'ERROR'
-            result['error_message'] = str(e)
+                done, _ = wait(future_to_target, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host, port = future_to_target.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = self._error_result(host, port, f'Scanning error: {str(e)}')
+                    
+                    if cycle is None:
+                        yield result
+                        continue
+                    
+                    yield from cycle.observe(result)
+                    for suspect in cycle.suspects():
+                        if self._host_answers(suspect):
+                            yield from cycle.confirm_alive(suspect)
+                        else:
+                            yield from cycle.mark_down(suspect, self._host_down_reason(suspect))
+                            self._cancel_host(future_to_target, suspect, cycle)
             
-        return result
+            if cycle is not None:
+                yield from cycle.finish()
+                self._report_outages(cycle)
+        finally:
+            # Consumer stopped early - drop probes that have not started yet
+            for future in future_to_target:
+                future.cancel()
     
-    def scan_multiple_ports(self, host: str, ports: List[int]) -> List[Dict]:
+    def _skip_down_hosts(self, pairs: Iterator[Tuple[str, int]],
+                         cycle: Optional[LivenessCycle]) -> Iterator[Tuple[str, int]]:
+        """Drop pairs for hosts declared down earlier in the cycle"""
+        for host, port in pairs:
+            if cycle is not None and cycle.is_down(host):
+                cycle.skip(host, port)
+                continue
+            yield host, port
+    
+    def _cancel_host(self, pending: Dict, host: str, cycle: LivenessCycle):
         """
-        Scan multiple ports concurrently
+        Cancel the not-yet-started probes of a host that was declared down
+        
+        Probes already running are left to finish and report normally.
+        """
+        for future, (pending_host, port) in list(pending.items()):
+            if pending_host == host and future.cancel():
+                del pending[future]
+                cycle.skip(host, port)
+    
+    def set_host_down_callback(self, callback: Callable):
+        """Set callback for host outage events (one per down host per cycle)"""
+        self.host_down_callback = callback
+    
+    def _host_answers(self, host: str) -> bool:
+        """
+        Check a suspect host by connecting to a port that was open before
         
-        Args:
-            host: Target hostname or IP address
-            ports: List of port numbers to scan
-            
         Returns:
-            List of scan results
+            True if the known-open port accepted or refused the connection
         """
-        results = []
+        port = self.liveness.known_open_port(host)
+        if port is None:
+            return False
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all scanning tasks
-            future_to_port = {
-                executor.submit(self.scan_port, host, port): port 
-                for port in ports
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_port):
-                try:
-                    result = future.result()
-                    results.append(result)
-                except Exception as e:
-                    port = future_to_port[future]
-                    results.append({
-                        'host': host,
-                        'port': port,
-                        'status': 'ERROR',
-                        'response_time_ms': 0,
-                        'timestamp': datetime.now().isoformat(),
-                        'error_message': f'Scanning error: {str(e)}',
-                        'protocol_info': None
-                    })
+        try:
+            addresses = self.resolver.resolve_all(host)
+        except socket.gaierror:
+            return False
         
-        # Sort results by port number
-        results.sort(key=lambda x: x['port'])
-        return results
+        sock, code, _, _ = self._connect_race(addresses, port, self.get_connect_timeout(host))
+        if sock is not None:
+            sock.close()
+        return code in (0, errno.ECONNREFUSED)
+    
+    def _host_down_reason(self, host: str) -> str:
+        """Describe why a suspect host was declared down"""
+        port = self.liveness.known_open_port(host)
+        if port is None:
+            return f'{self.liveness.timeout_threshold} timeouts with no reply'
+        return f'{self.liveness.timeout_threshold} timeouts and known-open port {port} did not answer'
+    
+    def _report_outages(self, cycle: Optional[LivenessCycle]):
+        """Pass a finished cycle's outage events to the host-down callback"""
+        if cycle is None or self.host_down_callback is None:
+            return
+        for outage in cycle.outages.values():
+            self.host_down_callback(outage)
     
-    def _test_protocol(self, host: str, port: int, sock: socket.socket) -> Optional[Dict]:
+    def _error_result(self, host: str, port: int, message: str) -> ScanResult:
+        """Build an ERROR result for a probe that raised unexpectedly"""
+        result = self._new_result(host, port)
+        result['status'] = 'ERROR'
+        result['error_message'] = message
+        return result
+    
+    def _test_protocol(self, host: str, port: int, sock: socket.socket,
+                       timer: Optional[PhaseTimer] = None) -> Optional[Dict]:
         """
         Test protocol-specific functionality for open ports
         
+        The probe registered for the port (see probes.ProbeRegistry) runs on
+        the socket that scan_port already connected, so each port costs a
+        single TCP connection. TLS ports are upgraded in place on the same
+        socket.
+        
         Args:
             host: Target hostname
             port: Port number
             sock: Open socket connection
+            timer: Optional phase timer for TLS and first-byte timings
             
         Returns:
             Protocol information if available
         """
         try:
-            if port in [25, 465, 587]:  # SMTP ports
-                return self._test_smtp(host, port)
-            elif port in [110, 995]:    # POP3 ports
-                return self._test_pop3(host, port)
-            elif port in [143, 993]:    # IMAP ports
-                return self._test_imap(host, port)
-            elif port in [80, 443]:     # HTTP/HTTPS ports
-                return self._test_http(host, port)
+            return self.probes.run(self, host, port, sock, timer)
         except Exception as e:
             return {'protocol_test': 'FAILED', 'error': str(e)}
-        
-        return None
     
-    def _test_smtp(self, host: str, port: int) -> Dict:
-        """Test SMTP protocol functionality"""
-        try:
-            if port == 465:  # SMTP SSL
-                server = smtplib.SMTP_SSL(host, port, timeout=self.timeout)
-            else:  # SMTP or SMTP TLS
-                server = smtplib.SMTP(host, port, timeout=self.timeout)
-                if port == 587:  # Try STARTTLS for port 587
-                    server.starttls()
-            
-            # Get server greeting
-            greeting = server.ehlo_or_helo_if_needed()
-            server.quit()
-            
-            return {
-                'protocol': 'SMTP',
-                'test_result': 'SUCCESS',
-                'server_response': str(greeting) if greeting else 'Connected'
-            }
-            
-        except Exception as e:
-            return {
-                'protocol': 'SMTP',
-                'test_result': 'FAILED',
-                'error': str(e)
-            }
+    def _get_ssl_context(self) -> ssl.SSLContext:
+        """Return the scanner's shared TLS client context, creating it once"""
+        with self._tls_lock:
+            if self._ssl_context is None:
+                # Same policy as the smtplib/poplib/imaplib defaults: we measure
+                # reachability, not certificate validity
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+                self._ssl_context = context
+            return self._ssl_context
     
-    def _test_pop3(self, host: str, port: int) -> Dict:
-        """Test POP3 protocol functionality"""
-        try:
-            if port == 995:  # POP3 SSL
-                server = poplib.POP3_SSL(host, port, timeout=self.timeout)
-            else:  # POP3
-                server = poplib.POP3(host, port, timeout=self.timeout)
-            
-            # Get server greeting
-            greeting = server.getwelcome()
-            server.quit()
-            
-            return {
-                'protocol': 'POP3',
-                'test_result': 'SUCCESS',
-                'server_response': greeting.decode('utf-8') if isinstance(greeting, bytes) else str(greeting)
-            }
-            
-        except Exception as e:
-            return {
-                'protocol': 'POP3',
-                'test_result': 'FAILED',
-                'error': str(e)
-            }
+    def _wrap_tls(self, host: str, port: int, sock: socket.socket,
+                  timer: Optional[PhaseTimer] = None) -> ssl.SSLSocket:
+        """Upgrade a connected socket to TLS in place, resuming a cached session if any"""
+        context = self._get_ssl_context()
+        with self._tls_lock:
+            session = self._tls_sessions.get((host, port))
+        
+        # A session the server no longer accepts just falls back to a full handshake
+        handshake_start = PhaseTimer.now()
+        tls_sock = context.wrap_socket(sock, server_hostname=host, session=session)
+        if timer is not None:
+            timer.add_tls(handshake_start)
+        
+        with self._tls_lock:
+            self.tls_handshakes += 1
+            if tls_sock.session_reused:
+                self.tls_resumed += 1
+        return tls_sock
     
-    def _test_imap(self, host: str, port: int) -> Dict:
-        """Test IMAP protocol functionality"""
-        try:
-            if port == 993:  # IMAP SSL
-                server = imaplib.IMAP4_SSL(host, port)
-            else:  # IMAP
-                server = imaplib.IMAP4(host, port)
-            
-            # Get server greeting
-            greeting = server.response('OK')
-            server.logout()
-            
-            return {
-                'protocol': 'IMAP',
-                'test_result': 'SUCCESS',
-                'server_response': str(greeting)
-            }
-            
-        except Exception as e:
-            return {
-                'protocol': 'IMAP',
-                'test_result': 'FAILED',
-                'error': str(e)
-            }
+    def _save_tls_session(self, host: str, port: int, sock: socket.socket) -> Optional[bool]:
+        """
+        Remember the TLS session of a probe socket for the next cycle
+        
+        Call after reading from the socket: TLS 1.3 session tickets arrive
+        after the handshake.
+        
+        Returns:
+            Whether the handshake was resumed, or None for plain sockets
+        """
+        if not isinstance(sock, ssl.SSLSocket):
+            return None
+        
+        session = sock.session
+        if session is not None:
+            with self._tls_lock:
+                self._tls_sessions.pop((host, port), None)
+                if len(self._tls_sessions) >= self.max_tls_sessions:
+                    # Evict the oldest entry (dicts keep insertion order)
+                    del self._tls_sessions[next(iter(self._tls_sessions))]
+                self._tls_sessions[(host, port)] = session
+        
+        return sock.session_reused
     
-    def _test_http(self, host: str, port: int) -> Dict:
-        """Test HTTP/HTTPS protocol functionality"""
-        try:
-            protocol = 'https' if port == 443 else 'http'
-            url = f"{protocol}://{host}:{port}"
-            
-            response = requests.head(url, timeout=self.timeout, allow_redirects=True)
-            
+    def get_tls_stats(self) -> Dict:
+        """Get TLS handshake and session resumption counters"""
+        with self._tls_lock:
             return {
-                'protocol': protocol.upper(),
-                'test_result': 'SUCCESS',
-                'status_code': response.status_code,
-                'server_header': response.headers.get('Server', 'Unknown')
-            }
-            
-        except Exception as e:
-            return {
-                'protocol': 'HTTP/HTTPS',
-                'test_result': 'FAILED',
-                'error': str(e)
+                'handshakes': self.tls_handshakes,
+                'resumed': self.tls_resumed,
+                'cached_sessions': len(self._tls_sessions)
             }
     
+    def _get_http_session(self) -> requests.Session:
+        """Return the scanner's pooled HTTP session, creating it once"""
+        with self._executor_lock:
+            if self._http_session is None:
+                # Bounded keep-alive pool: up to http_pool_per_host connections
+                # for each of the http_pool_hosts most recent hosts
+                adapter = HTTPAdapter(
+                    pool_connections=self.http_pool_hosts,
+                    pool_maxsize=self.http_pool_per_host,
+                    pool_block=True,
+                    max_retries=0
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = 'port-monitor'
+                
+                # Same certificate policy as the socket probes (see
+                # _get_ssl_context), so both modes agree on what OPEN means
+                session.verify = False
+                warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+                
+                # Name resolution stays with urllib3, which has no resolver
+                # hook: swapping in a cached address would break SNI and the
+                # Host header. Pooled keep-alive connections only resolve
+                # when a new connection is opened.
+                self._http_session = session
+            return self._http_session
+    
     def get_default_ports(self) -> List[int]:
         """Get the default list of ports to monitor"""
         return [25, 465, 587, 110, 995, 143, 993, 80, 443]
@@ -275,7 +1453,7 @@ class PortScanner:
             True if host is reachable, False otherwise
         """
         try:
-            socket.gethostbyname(host)
+            self.resolver.resolve(host)
             return True
         except socket.gaierror:
             return False
@@ -299,11 +1477,467 @@ class PortScanner:
             143: "IMAP (Internet Message Access Protocol)",
             993: "IMAP over SSL/TLS",
             80: "HTTP (Hypertext Transfer Protocol)",
-            443: "HTTPS (HTTP over SSL/TLS)"
+            443: "HTTPS (HTTP over SSL/TLS)",
+            4190: "ManageSieve (Sieve filter management)"
         }
         
         return descriptions.get(port, f"Custom port {port}")
 
+class AsyncPortScanner(PortScanner):
+    def __init__(self, timeout: int = 10, max_concurrency: int = 1000,
+                 probe_protocols: bool = True, resolver: Optional[DNSCache] = None,
+                 max_workers: int = 32, adaptive_timeout: bool = True,
+                 min_timeout: float = 1.0, rate_limiter: Optional[RateLimiter] = None,
+                 http_probe: str = 'socket', retry_policy: Optional[RetryPolicy] = None,
+                 probes: Optional[ProbeRegistry] = None, liveness: Optional[HostLiveness] = None):
+        """
+        Initialize the asyncio port scanner
+        
+        Connects run on a single event loop instead of one thread per port,
+        so thousands of probes can be in flight at once. Results are the same
+        ScanResult records as PortScanner.scan_port returns.
+        
+        Args:
+            timeout: Connection timeout in seconds
+            max_concurrency: Maximum number of connects in flight at once
+            probe_protocols: Run protocol tests on open ports
+            resolver: DNS cache to use (a private one is created by default)
+            max_workers: Worker threads for blocking DNS lookups and protocol probes
+            adaptive_timeout: Derive per-host connect timeouts from measured RTT
+            min_timeout: Lower bound in seconds for adaptive connect timeouts
+            rate_limiter: Optional limiter for outbound connects per second
+            http_probe: 'socket' or 'session' (see PortScanner)
+            retry_policy: Optional policy for retrying TIMEOUT results
+            probes: Protocol probes run on open ports (see PortScanner)
+            liveness: Optional host-down detection (see PortScanner)
+        """
+        super().__init__(timeout=timeout, max_workers=max_workers, resolver=resolver,
+                         adaptive_timeout=adaptive_timeout, min_timeout=min_timeout,
+                         rate_limiter=rate_limiter, http_probe=http_probe,
+                         retry_policy=retry_policy, probes=probes, liveness=liveness)
+        self.max_concurrency = max_concurrency
+        self.probe_protocols = probe_protocols
+    
+    async def scan_port_async(self, host: str, port: int,
+                              semaphore: Optional[asyncio.Semaphore] = None,
+                              retry_budget: Optional[RetryBudget] = None) -> ScanResult:
+        """
+        Scan a single port on the event loop
+        
+        Args:
+            host: Target hostname or IP address
+            port: Port number to scan
+            semaphore: Optional semaphore bounding concurrent connects
+            retry_budget: Budget shared by the probes of one cycle
+        
+        Returns:
+            ScanResult for the port
+        """
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(1)
+        
+        result = await self._probe_port_async(host, port, semaphore)
+        if self.retry_policy is None:
+            return result
+        
+        if retry_budget is None:
+            retry_budget = self.retry_policy.new_budget()
+        
+        # Back off without holding a connect slot
+        attempt = 1
+        while self.retry_policy.should_retry(result, attempt) and retry_budget.take():
+            await asyncio.sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+            result = await self._probe_port_async(host, port, semaphore)
+        
+        result['attempts'] = attempt
+        return result
+    
+    async def _probe_port_async(self, host: str, port: int, semaphore: asyncio.Semaphore) -> ScanResult:
+        """Make a single connection attempt (plus protocol probe) on the event loop"""
+        async with semaphore:
+            result = self._new_result(host, port)
+            timer = PhaseTimer()
+            
+            # Connect a socket we own (rather than a stream transport) so the
+            # protocol probe can read the greeting on this same connection
+            loop = asyncio.get_running_loop()
+            
+            try:
+                # Cache hits skip the executor round trip entirely
+                dns_start = timer.now()
+                addresses = self.resolver.get_cached(host)
+                if addresses is None:
+                    addresses = await loop.run_in_executor(self._get_executor(), self._resolve_timed, host, timer)
+                else:
+                    timer.dns_us = timer.since(dns_start)
+                
+                # Wait for the rate limiter outside the measured phases
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire_async(host)
+                
+                connect_timeout = self.get_connect_timeout(host)
+                connect_start = timer.now()
+                sock, connection_result, family, address = await self._connect_race_async(
+                    addresses, port, connect_timeout
+                )
+                timer.connect_us = timer.since(connect_start)
+                result['address_family'] = _FAMILY_NAMES.get(family)
+                result['address'] = address
+            
+            except socket.gaierror as e:
+                result['status'] = 'ERROR'
+                result['error_message'] = f'DNS resolution failed: {str(e)}'
+                result.update(timer.as_dict())
+                return result
+            
+            except Exception as e:
+                result['status'] = 'ERROR'
+                result['error_message'] = str(e)
+                result.update(timer.as_dict())
+                return result
+            
+            if connection_result in _CONNECT_TIMEOUT_ERRNOS:
+                result['status'] = 'TIMEOUT'
+                result['response_time_ms'] = int(connect_timeout * 1000)
+                result['error_message'] = 'Connection timeout'
+                self._record_timeout(host, connect_timeout)
+                result.update(timer.as_dict())
+                return result
+            
+            if connection_result != 0:
+                # Refused, unreachable, reset - same as a non-zero connect_ex
+                result['status'] = 'CLOSED'
+                result['response_time_ms'] = timer.response_time_ms()
+                if connection_result == errno.ECONNREFUSED:
+                    # A RST is still a full round trip
+                    self._record_rtt(host, timer.connect_us / 1_000_000)
+                result.update(timer.as_dict())
+                return result
+            
+            result['status'] = 'OPEN'
+            result['response_time_ms'] = timer.response_time_ms()
+            self._record_rtt(host, timer.connect_us / 1_000_000)
+        
+        # Protocol probes do blocking reads, so run them off the loop and
+        # outside the semaphore so slow greetings do not hold connect slots
+        try:
+            if self.probe_protocols:
+                sock.settimeout(self.timeout)
+                protocol_info = await loop.run_in_executor(
+                    self._get_executor(), self._test_protocol_timed, host, port, sock, timer
+                )
+                if protocol_info:
+                    result['protocol_info'] = protocol_info
+        finally:
+            sock.close()
+        
+        result.update(timer.as_dict())
+        return result
+    
+    def _resolve_timed(self, host: str, timer: PhaseTimer) -> List[Tuple[int, str]]:
+        """Resolve a host on an executor thread, timing the lookup but not the queue wait"""
+        dns_start = timer.now()
+        try:
+            return self.resolver.resolve_all(host)
+        finally:
+            timer.dns_us = timer.since(dns_start)
+    
+    def _test_protocol_timed(self, host: str, port: int, sock: socket.socket,
+                             timer: PhaseTimer) -> Optional[Dict]:
+        """
+        Run the protocol probe on an executor thread
+        
+        The post-connect timers start here rather than when the probe was
+        queued, so first_byte_us and protocol_us do not include time spent
+        waiting for a free executor thread.
+        """
+        timer.connected()
+        protocol_info = self._test_protocol(host, port, sock, timer)
+        if protocol_info:
+            timer.protocol_done()
+        return protocol_info
+    
+    async def _connect_race_async(self, addresses: List[Tuple[int, str]], port: int,
+                                  timeout: float) -> Tuple[Optional[socket.socket], int, int, str]:
+        """
+        Event loop version of PortScanner._connect_race
+        
+        Args:
+            addresses: (family, address) tuples in racing order
+            port: Port number
+            timeout: Connect timeout per attempt in seconds
+            
+        Returns:
+            (socket, errno, family, address) as for PortScanner._connect_race
+        """
+        loop = asyncio.get_running_loop()
+        
+        async def attempt(family: int, address: str) -> socket.socket:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (address, port)), timeout=timeout)
+            except BaseException:
+                sock.close()
+                raise
+            return sock
+        
+        attempts = {}
+        failures = []
+        remaining = list(addresses)
+        winner = None
+        
+        try:
+            while winner is None and (remaining or attempts):
+                if remaining:
+                    family, address = remaining.pop(0)
+                    attempts[asyncio.ensure_future(attempt(family, address))] = (family, address)
+                
+                # Start the next address after the attempt delay, or as soon
+                # as an attempt fails
+                done, _ = await asyncio.wait(
+                    attempts, timeout=self.connection_attempt_delay if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    family, address = attempts.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if winner is None:
+                            winner = (task.result(), 0, family, address)
+                        else:
+                            task.result().close()
+                    elif isinstance(error, asyncio.TimeoutError):
+                        failures.append((errno.ETIMEDOUT, family, address))
+                    elif isinstance(error, OSError):
+                        failures.append((error.errno, family, address))
+                    else:
+                        raise error
+        finally:
+            # Abandon the losers; cancelling closes their sockets
+            for task in attempts:
+                task.cancel()
+            if attempts:
+                await asyncio.gather(*attempts, return_exceptions=True)
+                for task in attempts:
+                    if not task.cancelled() and task.exception() is None:
+                        task.result().close()
+        
+        if winner is not None:
+            return winner
+        
+        code, family, address = _pick_connect_failure(failures)
+        return None, code, family, address
+    
+    async def scan_multiple_ports_async(self, host: str, ports: List[int]) -> List[ScanResult]:
+        """
+        Scan multiple ports concurrently on the running event loop
+        
+        Args:
+            host: Target hostname or IP address
+            ports: List of port numbers to scan
+        
+        Returns:
+            List of scan results sorted by port
+        """
+        results = [result async for result in self.scan_iter_async(host, ports)]
+        results.sort(key=lambda x: x['port'])
+        return results
+    
+    async def scan_iter_async(self, host: str, ports: Iterable[int]) -> AsyncIterator[ScanResult]:
+        """
+        Scan multiple ports, yielding each result as soon as it completes
+        
+        At most max_concurrency tasks exist at a time, so memory stays flat
+        however many ports are passed in.
+        
+        Args:
+            host: Target hostname or IP address
+            ports: Port numbers to scan (any iterable, consumed lazily)
+        
+        Yields:
+            ScanResult records in completion order
+        """
+        # Warm the resolver once so the per-port tasks all hit the cache
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._get_executor(), self.resolver.resolve_all, host)
+        except socket.gaierror:
+            pass  # cached as a negative entry; each task reports the error
+        
+        scan = self._scan_pairs_async((host, port) for port in ports)
+        try:
+            async for result in scan:
+                yield result
+        finally:
+            await scan.aclose()
+    
+    async def scan_targets_async(self, targets: TargetSpec) -> AsyncIterator[ScanResult]:
+        """
+        Scan every (host, port) pair of a target specification
+        
+        Args:
+            targets: TargetSpec describing hosts, CIDR blocks and port ranges
+        
+        Yields:
+            ScanResult records in completion order
+        """
+        scan = self._scan_pairs_async(iter(targets))
+        try:
+            async for result in scan:
+                yield result
+        finally:
+            await scan.aclose()
+    
+    async def _scan_pairs_async(self, pairs: Iterator[Tuple[str, int]]) -> AsyncIterator[ScanResult]:
+        """Run scan_port_async over (host, port) pairs with a bounded task window"""
+        semaphore = _TrackingSemaphore(self.max_concurrency)
+        task_to_target = {}
+        retry_budget = self.retry_policy.new_budget() if self.retry_policy else None
+        cycle = self.liveness.new_cycle() if self.liveness else None
+        pairs = self._skip_down_hosts(pairs, cycle)
+        loop = asyncio.get_running_loop()
+        
+        try:
+            while True:
+                for host, port in pairs:
+                    task = asyncio.ensure_future(self.scan_port_async(host, port, semaphore, retry_budget))
+                    task_to_target[task] = (host, port)
+                    if len(task_to_target) >= self.max_concurrency:
+                        break
+                
+                if not task_to_target:
+                    break
+                
+                done, _ = await asyncio.wait(task_to_target, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    host, port = task_to_target.pop(task)
+                    semaphore.forget(task)
+                    if task.exception() is not None:
+                        result = self._error_result(host, port, f'Scanning error: {str(task.exception())}')
+                    else:
+                        result = task.result()
+                    
+                    if cycle is None:
+                        yield result
+                        continue
+                    
+                    for released in cycle.observe(result):
+                        yield released
+                    for suspect in cycle.suspects():
+                        if await loop.run_in_executor(self._get_executor(), self._host_answers, suspect):
+                            for released in cycle.confirm_alive(suspect):
+                                yield released
+                        else:
+                            for released in cycle.mark_down(suspect, self._host_down_reason(suspect)):
+                                yield released
+                            for released in await self._cancel_host_async(
+                                    task_to_target, suspect, cycle, semaphore):
+                                yield released
+            
+            if cycle is not None:
+                for released in cycle.finish():
+                    yield released
+                self._report_outages(cycle)
+        finally:
+            # Consumer stopped early - do not leave probes running, and wait
+            # for the cancellations so their sockets are closed
+            for task in task_to_target:
+                task.cancel()
+            if task_to_target:
+                await asyncio.gather(*task_to_target, return_exceptions=True)
+    
+    async def _cancel_host_async(self, pending: Dict, host: str, cycle: LivenessCycle,
+                                 semaphore: '_TrackingSemaphore') -> List[ScanResult]:
+        """
+        Cancel the remaining probes of a host that was declared down
+        
+        Task.cancel() also succeeds on running tasks, so probes that never
+        got a connect slot are counted as skipped, while probes that were
+        connecting or retrying are awaited and reported as timed out.
+        
+        Returns:
+            Results to report for the cancelled probes
+        """
+        running = []
+        for task, (pending_host, port) in list(pending.items()):
+            if pending_host != host or task.done():
+                continue  # finished tasks are reported by the next wait
+            del pending[task]
+            task.cancel()
+            if semaphore.forget(task):
+                running.append((task, port))
+            else:
+                cycle.skip(host, port)
+        
+        outcomes = await asyncio.gather(*(task for task, _ in running), return_exceptions=True)
+        
+        results = []
+        for (_, port), outcome in zip(running, outcomes):
+            if isinstance(outcome, ScanResult):
+                # Finished before the cancellation landed
+                results.extend(cycle.observe(outcome))
+            else:
+                results.append(cycle.interrupted(host, port))
+        return results
+    
+    def scan_multiple_ports(self, host: str, ports: List[int]) -> List[ScanResult]:
+        """
+        Scan multiple ports from synchronous code
+        
+        Runs a private event loop, so this is a drop-in replacement for
+        PortScanner.scan_multiple_ports (e.g. from MonitoringScheduler).
+        
+        Args:
+            host: Target hostname or IP address
+            ports: List of port numbers to scan
+        
+        Returns:
+            List of scan results
+        """
+        return asyncio.run(self.scan_multiple_ports_async(host, ports))
+    
+    def scan_iter(self, host: str, ports: Iterable[int]) -> Iterator[ScanResult]:
+        """
+        Synchronous wrapper around scan_iter_async on a private event loop
+        
+        Args:
+            host: Target hostname or IP address
+            ports: Port numbers to scan (any iterable, consumed lazily)
+        
+        Yields:
+            ScanResult records in completion order
+        """
+        return self._drive(self.scan_iter_async(host, ports))
+    
+    def scan_targets(self, targets: TargetSpec) -> Iterator[ScanResult]:
+        """
+        Synchronous wrapper around scan_targets_async on a private event loop
+        
+        Args:
+            targets: TargetSpec describing hosts, CIDR blocks and port ranges
+        
+        Yields:
+            ScanResult records in completion order
+        """
+        return self._drive(self.scan_targets_async(targets))
+    
+    def _drive(self, agen: AsyncIterator[ScanResult]) -> Iterator[ScanResult]:
+        """Step an async result generator from synchronous code"""
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            try:
+                loop.run_until_complete(agen.aclose())
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
+
 # Example usage and testing
 if __name__ == "__main__":
     scanner = PortScanner()
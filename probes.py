@@ -0,0 +1,483 @@
+"""
+Protocol Probe Module
+Pluggable protocol probes run on open ports by the Comcast Port Monitor
+"""
+
+import socket
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def read_line(reader, timer=None) -> str:
+    """
+    Read one CRLF-terminated line from a socket file
+    
+    Args:
+        reader: File object from sock.makefile('rb')
+        timer: Optional PhaseTimer; the first read marks the first byte
+    
+    Returns:
+        Decoded line without the line ending
+    """
+    line = reader.readline(4096)
+    if not line:
+        raise ConnectionError('Connection closed by server')
+    if timer is not None:
+        timer.first_byte()
+    return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+def read_smtp_reply(reader, timer=None) -> Tuple[int, str]:
+    """Read a (possibly multi-line) SMTP reply"""
+    lines = []
+    while True:
+        line = read_line(reader, timer)
+        lines.append(line[4:])
+        if len(line) < 4 or line[3] != '-':
+            break
+    code = int(line[:3]) if line[:3].isdigit() else -1
+    return code, '\n'.join(lines)
+
+def send_goodbye(sock: socket.socket, command: bytes):
+    """Send a closing command without waiting for the reply; the result is already known"""
+    try:
+        sock.sendall(command)
+    except OSError:
+        pass
+
+class Probe:
+    """
+    Base class for protocol probes
+    
+    A probe runs on the socket the scanner already connected. By default it
+    does the least work that proves the service answers - usually reading
+    the greeting banner - and full_handshake turns on the extra round trips
+    (capabilities, STARTTLS) for probes that support them.
+    
+    Subclasses set name, ports, tls_ports and banner_prefixes, and
+    implement run(). tls_ports only covers the default ports; a registry
+    records which ports start with TLS for each registration.
+    """
+    name = 'TCP'
+    ports: Tuple[int, ...] = ()
+    tls_ports: Tuple[int, ...] = ()         # ports that start with a TLS handshake
+    banner_prefixes: Tuple[str, ...] = ()   # greetings recognized when sniffing
+    
+    def __init__(self, full_handshake: bool = False):
+        """
+        Initialize the probe
+        
+        Args:
+            full_handshake: Do the full protocol exchange instead of only
+                reading the banner
+        """
+        self.full_handshake = full_handshake
+    
+    def matches_banner(self, banner: str) -> bool:
+        """Check whether a sniffed greeting belongs to this protocol"""
+        return bool(self.banner_prefixes) and banner.startswith(self.banner_prefixes)
+    
+    def uses_tls(self, port: int, tls: Optional[bool] = None) -> bool:
+        """Whether a port starts with a TLS handshake (tls overrides the class default)"""
+        return port in self.tls_ports if tls is None else tls
+    
+    def probe(self, scanner, host: str, port: int, sock: socket.socket, timer=None,
+              tls: Optional[bool] = None) -> Dict:
+        """
+        Run the probe and build the protocol_info dictionary
+        
+        Args:
+            scanner: PortScanner running the probe (TLS and HTTP helpers)
+            host: Target hostname
+            port: Port number
+            sock: Connected socket
+            timer: Optional PhaseTimer for TLS and first-byte timings
+            tls: Start with a TLS handshake (defaults to port in tls_ports)
+        
+        Returns:
+            Protocol information with test_result SUCCESS or FAILED
+        """
+        try:
+            if self.uses_tls(port, tls):
+                sock = scanner._wrap_tls(host, port, sock, timer)
+            
+            info, sock = self.run(scanner, host, port, sock, timer)
+            info = {'protocol': self.name, 'test_result': 'SUCCESS', **info}
+            
+            tls_resumed = scanner._save_tls_session(host, port, sock)
+            if tls_resumed is not None:
+                info['tls_resumed'] = tls_resumed
+            return info
+        
+        except Exception as e:
+            return {
+                'protocol': self.name,
+                'test_result': 'FAILED',
+                'error': str(e)
+            }
+        
+        finally:
+            # A TLS upgrade detaches the caller's socket, so the socket in
+            # hand here is the only one that can still close the connection
+            sock.close()
+    
+    def run(self, scanner, host: str, port: int, sock: socket.socket,
+            timer=None) -> Tuple[Dict, socket.socket]:
+        """
+        Talk to the service
+        
+        Returns:
+            (info, sock) - extra protocol_info fields, and the socket in use
+            at the end (a TLS socket if the probe upgraded it); probe()
+            closes it. Readers from sock.makefile() must be closed by run().
+        
+        Raises:
+            Exception: Any failure; probe() records it as FAILED
+        """
+        raise NotImplementedError
+    
+    def __repr__(self) -> str:
+        mode = 'full' if self.full_handshake else 'banner'
+        return f"{type(self).__name__}({mode})"
+
+class SMTPProbe(Probe):
+    """SMTP greeting; full handshake adds EHLO and STARTTLS on 587"""
+    name = 'SMTP'
+    ports = (25, 465, 587)
+    tls_ports = (465,)
+    banner_prefixes = ('220 ', '220-')
+    
+    def run(self, scanner, host, port, sock, timer=None):
+        with sock.makefile('rb') as reader:
+            code, greeting = read_smtp_reply(reader, timer)
+            if code != 220:
+                raise ConnectionError(f'Unexpected greeting: {code} {greeting}')
+            
+            info = {'server_response': greeting if greeting else 'Connected'}
+            
+            if self.full_handshake:
+                sock.sendall(b'EHLO port-monitor\r\n')
+                code, extensions = read_smtp_reply(reader)
+                info['extensions'] = extensions.split('\n')[1:]
+                
+                if port == 587:
+                    sock.sendall(b'STARTTLS\r\n')
+                    code, message = read_smtp_reply(reader)
+                    if code != 220:
+                        raise ConnectionError(f'STARTTLS refused: {code} {message}')
+                    sock = scanner._wrap_tls(host, port, sock, timer)
+        
+        # Sent without waiting for the reply, so it costs no round trip
+        send_goodbye(sock, b'QUIT\r\n')
+        return info, sock
+
+class POP3Probe(Probe):
+    """POP3 greeting; full handshake adds CAPA"""
+    name = 'POP3'
+    ports = (110, 995)
+    tls_ports = (995,)
+    banner_prefixes = ('+OK',)
+    
+    def run(self, scanner, host, port, sock, timer=None):
+        with sock.makefile('rb') as reader:
+            greeting = read_line(reader, timer)
+            if not greeting.startswith('+OK'):
+                raise ConnectionError(f'Unexpected greeting: {greeting}')
+            
+            info = {'server_response': greeting}
+            
+            if self.full_handshake:
+                sock.sendall(b'CAPA\r\n')
+                if read_line(reader).startswith('+OK'):
+                    capabilities = []
+                    while True:
+                        line = read_line(reader)
+                        if line == '.':
+                            break
+                        capabilities.append(line)
+                    info['capabilities'] = capabilities
+        
+        send_goodbye(sock, b'QUIT\r\n')
+        return info, sock
+
+class IMAPProbe(Probe):
+    """IMAP greeting; full handshake adds CAPABILITY"""
+    name = 'IMAP'
+    ports = (143, 993)
+    tls_ports = (993,)
+    banner_prefixes = ('* OK', '* PREAUTH')
+    
+    def run(self, scanner, host, port, sock, timer=None):
+        with sock.makefile('rb') as reader:
+            greeting = read_line(reader, timer)
+            if not greeting.startswith(('* OK', '* PREAUTH')):
+                raise ConnectionError(f'Unexpected greeting: {greeting}')
+            
+            info = {'server_response': greeting}
+            
+            if self.full_handshake:
+                sock.sendall(b'a1 CAPABILITY\r\n')
+                while True:
+                    line = read_line(reader)
+                    if line.startswith('* CAPABILITY '):
+                        info['capabilities'] = line[len('* CAPABILITY '):].split()
+                    elif line.startswith('a1 '):
+                        break
+        
+        send_goodbye(sock, b'a2 LOGOUT\r\n')
+        return info, sock
+
+class SieveProbe(Probe):
+    """ManageSieve capability greeting; full handshake adds STARTTLS"""
+    name = 'SIEVE'
+    ports = (4190,)
+    banner_prefixes = ('"IMPLEMENTATION"', '"SIEVE"')
+    
+    def run(self, scanner, host, port, sock, timer=None):
+        # The greeting is the capability list, ended by an OK line
+        with sock.makefile('rb') as reader:
+            capabilities = []
+            while True:
+                line = read_line(reader, timer)
+                if line.startswith('OK'):
+                    break
+                if line.startswith(('NO', 'BYE')):
+                    raise ConnectionError(f'Unexpected greeting: {line}')
+                capabilities.append(line)
+            
+            info = {'server_response': line, 'capabilities': capabilities}
+            
+            if self.full_handshake and any(cap.upper().startswith('"STARTTLS"') for cap in capabilities):
+                sock.sendall(b'STARTTLS\r\n')
+                reply = read_line(reader)
+                if not reply.startswith('OK'):
+                    raise ConnectionError(f'STARTTLS refused: {reply}')
+                sock = scanner._wrap_tls(host, port, sock, timer)
+        
+        send_goodbye(sock, b'LOGOUT\r\n')
+        return info, sock
+
+class HTTPProbe(Probe):
+    """HEAD / on the probe connection; full handshake uses the pooled session and follows redirects"""
+    name = 'HTTP'
+    ports = (80, 443)
+    tls_ports = (443,)
+    banner_prefixes = ()  # HTTP servers wait for the client, nothing to sniff
+    
+    def probe(self, scanner, host, port, sock, timer=None, tls=None):
+        tls = self.uses_tls(port, tls)
+        if self.full_handshake or scanner.http_probe == 'session':
+            # The pooled session opens (or reuses) its own connection, so
+            # the probe socket is closed instead of being upgraded to TLS
+            sock.close()
+            try:
+                info = {'protocol': self.name, 'test_result': 'SUCCESS',
+                        **self._run_session(scanner, host, port, tls)}
+            except Exception as e:
+                info = {'protocol': self.name, 'test_result': 'FAILED', 'error': str(e)}
+        else:
+            info = super().probe(scanner, host, port, sock, timer, tls)
+        
+        if info['test_result'] == 'FAILED':
+            info['protocol'] = 'HTTP/HTTPS'
+        else:
+            info['protocol'] = 'HTTPS' if tls else 'HTTP'
+        return info
+    
+    def run(self, scanner, host, port, sock, timer=None):
+        request = (
+            f"HEAD / HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"User-Agent: port-monitor\r\n"
+            f"Connection: close\r\n\r\n"
+        )
+        sock.sendall(request.encode('ascii'))
+        
+        # Status line, then headers up to the blank line
+        with sock.makefile('rb') as reader:
+            status_line = read_line(reader, timer)
+            parts = status_line.split(' ', 2)
+            if len(parts) < 2 or not parts[0].startswith('HTTP/') or not parts[1].isdigit():
+                raise ConnectionError(f'Unexpected response: {status_line}')
+            
+            headers = {}
+            while True:
+                line = read_line(reader)
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        
+        return {
+            'status_code': int(parts[1]),
+            'server_header': headers.get('server', 'Unknown')
+        }, sock
+    
+    def _run_session(self, scanner, host: str, port: int, tls: bool) -> Dict:
+        """HEAD through the scanner's pooled requests session, following redirects"""
+        protocol = 'https' if tls else 'http'
+        # verify is repeated per request: REQUESTS_CA_BUNDLE in the
+        # environment overrides the session's default
+        response = scanner._get_http_session().head(
+            f"{protocol}://{host}:{port}", timeout=scanner.timeout, allow_redirects=True,
+            verify=False
+        )
+        response.close()
+        
+        return {
+            'status_code': response.status_code,
+            'server_header': response.headers.get('Server', 'Unknown')
+        }
+
+class ProbeRegistry:
+    def __init__(self, sniff_timeout: Optional[float] = None):
+        """
+        Initialize an empty probe registry
+        
+        Probes are looked up by port. Ports with no registered probe can
+        optionally be identified by peeking at the greeting banner.
+        
+        Args:
+            sniff_timeout: Seconds to wait for a banner on unregistered
+                ports (None = do not sniff, report no protocol info)
+        """
+        self.sniff_timeout = sniff_timeout
+        self._probes: List[Probe] = []
+        self._by_port: Dict[int, Probe] = {}
+        self._tls_ports = set()
+    
+    @classmethod
+    def default(cls, full_handshake: Iterable[str] = (), sniff_timeout: Optional[float] = None) -> 'ProbeRegistry':
+        """
+        Build a registry with the built-in mail and web probes
+        
+        Args:
+            full_handshake: Names of probes (e.g. 'SMTP') that should do the
+                full protocol exchange instead of a banner read
+            sniff_timeout: See __init__
+        
+        Returns:
+            Populated registry
+        """
+        registry = cls(sniff_timeout=sniff_timeout)
+        full_handshake = {name.upper() for name in full_handshake}
+        for probe_class in (SMTPProbe, POP3Probe, IMAPProbe, SieveProbe, HTTPProbe):
+            registry.register(probe_class(full_handshake=probe_class.name in full_handshake))
+        return registry
+    
+    def register(self, probe: Probe, ports: Optional[Iterable[int]] = None,
+                 tls_ports: Optional[Iterable[int]] = None) -> Probe:
+        """
+        Add a probe, replacing any probe registered for the same ports
+        
+        Args:
+            probe: Probe instance
+            ports: Ports to key it by (defaults to probe.ports)
+            tls_ports: Which of those ports start with a TLS handshake
+                (defaults to the ones in probe.tls_ports), e.g.
+                register(IMAPProbe(), ports=[10993], tls_ports=[10993])
+        
+        Returns:
+            The probe, so the call can be used inline
+        """
+        ports = list(probe.ports if ports is None else ports)
+        tls_ports = set(probe.tls_ports if tls_ports is None else tls_ports)
+        
+        if probe not in self._probes:
+            self._probes.append(probe)
+        for port in ports:
+            replaced = self._by_port.get(port)
+            self._by_port[port] = probe
+            if port in tls_ports:
+                self._tls_ports.add(port)
+            else:
+                self._tls_ports.discard(port)
+            if replaced is not None and replaced is not probe and replaced not in self._by_port.values():
+                self._probes.remove(replaced)
+        return probe
+    
+    def unregister(self, port: int):
+        """Stop probing a port"""
+        probe = self._by_port.pop(port, None)
+        self._tls_ports.discard(port)
+        if probe is not None and probe not in self._by_port.values():
+            self._probes.remove(probe)
+    
+    def get(self, port: int) -> Optional[Probe]:
+        """Get the probe registered for a port"""
+        return self._by_port.get(port)
+    
+    def is_tls(self, port: int) -> bool:
+        """Check whether a registered port starts with a TLS handshake"""
+        return port in self._tls_ports
+    
+    def get_by_name(self, name: str) -> Optional[Probe]:
+        """Get a registered probe by protocol name"""
+        for probe in self._probes:
+            if probe.name == name.upper():
+                return probe
+        return None
+    
+    def set_full_handshake(self, name: str, enabled: bool = True):
+        """
+        Turn the full protocol exchange on or off for one probe
+        
+        Raises:
+            KeyError: If no probe with that name is registered
+        """
+        probe = self.get_by_name(name)
+        if probe is None:
+            raise KeyError(f"No probe named {name!r}")
+        probe.full_handshake = enabled
+    
+    def sniff(self, sock: socket.socket) -> Optional[Probe]:
+        """
+        Identify a service by peeking at its greeting banner
+        
+        The banner is left unread (MSG_PEEK), so the matching probe reads it
+        normally.
+        
+        Returns:
+            Matching probe, or None if there was no banner or no match
+        """
+        previous_timeout = sock.gettimeout()
+        sock.settimeout(self.sniff_timeout)
+        try:
+            banner = sock.recv(512, socket.MSG_PEEK).decode('utf-8', errors='replace')
+        except OSError:
+            return None
+        finally:
+            sock.settimeout(previous_timeout)
+        
+        for probe in self._probes:
+            if probe.matches_banner(banner):
+                return probe
+        return None
+    
+    def run(self, scanner, host: str, port: int, sock: socket.socket, timer=None) -> Optional[Dict]:
+        """
+        Probe an open port with the matching probe
+        
+        Returns:
+            Protocol information, or None if no probe applies
+        """
+        probe = self.get(port)
+        if probe is not None:
+            return probe.probe(scanner, host, port, sock, timer, tls=self.is_tls(port))
+        
+        # A banner that could be sniffed was sent in plaintext
+        if self.sniff_timeout:
+            probe = self.sniff(sock)
+        if probe is None:
+            return None
+        return probe.probe(scanner, host, port, sock, timer, tls=False)
+    
+    def __repr__(self) -> str:
+        return f"ProbeRegistry({sorted(self._by_port)})"
+
+# Example usage and testing
+if __name__ == "__main__":
+    registry = ProbeRegistry.default(full_handshake=['SMTP'])
+    print(registry)
+    
+    registry.register(IMAPProbe(), ports=[10993], tls_ports=[10993])
+    
+    for port in (25, 587, 993, 443, 4190, 8080, 10993):
+        print(f"Port {port}: {registry.get(port)} (TLS: {registry.is_tls(port)})")
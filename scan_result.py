@@ -0,0 +1,200 @@
+"""
+Scan Result Module
+Compact record type for port scan results in the Comcast Port Monitor
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Status codes are interned so every result shares the same string objects
+STATUS_CODES = tuple(sys.intern(status) for status in ('UNKNOWN', 'OPEN', 'CLOSED', 'TIMEOUT', 'ERROR'))
+_INTERNED_STATUS = {status: status for status in STATUS_CODES}
+
+def now_ms() -> int:
+    """Current time as integer epoch milliseconds"""
+    return time.time_ns() // 1_000_000
+
+def to_epoch_ms(value) -> int:
+    """Convert an ISO string, datetime or number of milliseconds to epoch milliseconds"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+def to_isoformat(epoch_ms: int) -> str:
+    """Convert epoch milliseconds to a local ISO 8601 string"""
+    return datetime.fromtimestamp(epoch_ms / 1000).isoformat()
+
+class ScanResult:
+    """
+    Result of probing one port
+    
+    A slotted record instead of a dict: no per-instance dict, an integer
+    epoch-millisecond timestamp instead of an ISO string, and interned
+    status strings. Reading and writing result['key'], get(), update(),
+    keys(), items() and as_dict() behave like the dicts results used to
+    be, with 'timestamp' still presented as an ISO string.
+    """
+    __slots__ = (
+        'host', 'port', '_status', 'response_time_ms', 'epoch_ms',
+        'error_message', 'protocol_info', 'attempts', 'address_family', 'address',
+        'dns_us', 'connect_us', 'tls_handshake_us', 'first_byte_us', 'protocol_us',
+        'id', 'created_at'
+    )
+    
+    # Keys of the dict view, in the order results have always had them
+    FIELDS: Tuple[str, ...] = (
+        'host', 'port', 'status', 'response_time_ms', 'timestamp',
+        'error_message', 'protocol_info', 'attempts', 'address_family', 'address',
+        'dns_us', 'connect_us', 'tls_handshake_us', 'first_byte_us', 'protocol_us'
+    )
+    # Extra keys present on results read back from the database
+    RECORD_FIELDS: Tuple[str, ...] = ('id', 'created_at')
+    # Plain tuple layout for passing results between processes
+    ROW_FIELDS: Tuple[str, ...] = tuple('epoch_ms' if key == 'timestamp' else key for key in FIELDS)
+    
+    def __init__(self, host: str, port: int, status: str = 'UNKNOWN',
+                 response_time_ms: int = 0, epoch_ms: Optional[int] = None,
+                 error_message: Optional[str] = None, protocol_info: Optional[Dict] = None,
+                 attempts: int = 1):
+        """
+        Initialize a scan result
+        
+        Args:
+            host: Target hostname or IP address
+            port: Port number
+            status: One of STATUS_CODES
+            response_time_ms: Connect (or probe) time in milliseconds
+            epoch_ms: Result time in epoch milliseconds (defaults to now)
+            error_message: Error description, if any
+            protocol_info: Protocol probe output, if any
+            attempts: Connection attempts the result took
+        """
+        self.host = host
+        self.port = port
+        self.status = status
+        self.response_time_ms = response_time_ms
+        self.epoch_ms = now_ms() if epoch_ms is None else epoch_ms
+        self.error_message = error_message
+        self.protocol_info = protocol_info
+        self.attempts = attempts
+        self.address_family = None
+        self.address = None
+        self.dns_us = None
+        self.connect_us = None
+        self.tls_handshake_us = None
+        self.first_byte_us = None
+        self.protocol_us = None
+        self.id = None
+        self.created_at = None
+    
+    @property
+    def status(self) -> str:
+        return self._status
+    
+    @status.setter
+    def status(self, value: str):
+        self._status = _INTERNED_STATUS.get(value) or sys.intern(value)
+    
+    @property
+    def timestamp(self) -> str:
+        """Result time as a local ISO 8601 string"""
+        return to_isoformat(self.epoch_ms)
+    
+    @timestamp.setter
+    def timestamp(self, value):
+        self.epoch_ms = to_epoch_ms(value)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScanResult':
+        """Build a result from a dictionary with (a subset of) the dict view keys"""
+        result = cls(data['host'], data['port'])
+        result.update(data)
+        return result
+    
+    def as_row(self, encode_protocol_info: bool = False) -> tuple:
+        """
+        Values in ROW_FIELDS order
+        
+        Args:
+            encode_protocol_info: Store protocol_info as JSON text, ready for
+                the database, instead of as a dict
+        """
+        row = tuple(getattr(self, key) for key in self.ROW_FIELDS)
+        if encode_protocol_info and self.protocol_info:
+            index = self.ROW_FIELDS.index('protocol_info')
+            row = row[:index] + (json.dumps(self.protocol_info),) + row[index + 1:]
+        return row
+    
+    @classmethod
+    def from_row(cls, row: tuple) -> 'ScanResult':
+        """Rebuild a result from as_row() output (with or without encoded protocol_info)"""
+        result = cls.__new__(cls)
+        for key, value in zip(cls.ROW_FIELDS, row):
+            setattr(result, key, value)
+        if isinstance(result.protocol_info, str):
+            result.protocol_info = json.loads(result.protocol_info)
+        result.id = None
+        result.created_at = None
+        return result
+    
+    # Dict view
+    
+    def keys(self) -> Tuple[str, ...]:
+        if self.id is None:
+            return self.FIELDS
+        return self.FIELDS + self.RECORD_FIELDS
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+    
+    def __len__(self) -> int:
+        return len(self.keys())
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.keys():
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.FIELDS and key not in self.RECORD_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.keys():
+            return default
+        return getattr(self, key)
+    
+    def update(self, values: Dict):
+        """Set several keys at once, like dict.update"""
+        for key, value in values.items():
+            self[key] = value
+    
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((key, getattr(self, key)) for key in self.keys())
+    
+    def as_dict(self) -> Dict:
+        """Plain dictionary copy of the result"""
+        return dict(self.items())
+    
+    def __repr__(self) -> str:
+        return f"ScanResult({self.host}:{self.port} {self.status} {self.response_time_ms}ms)"
+
+# Example usage and testing
+if __name__ == "__main__":
+    result = ScanResult('mail.comcast.net', 25, status='OPEN', response_time_ms=42)
+    result['protocol_info'] = {'protocol': 'SMTP', 'test_result': 'SUCCESS'}
+    
+    print(result)
+    print(result.as_dict())
+    print(f"Size: {sys.getsizeof(result)} bytes (dict view: {sys.getsizeof(result.as_dict())} bytes)")
@@ -6,11 +6,20 @@ Handles scheduled port scanning for the Comcast Port Monitor
 import threading
 import time
 from datetime import datetime, timedelta
-from typing import Optional, List, Callable
+from typing import Dict, Optional, List, Callable, Tuple
 import schedule
 import random
 
+from targets import TargetSpec
+
 class MonitoringScheduler:
+    # Ports whose blocking points at an ISP mail filter
+    EMAIL_PORTS = frozenset((25, 465, 587, 110, 995, 143, 993))
+    
+    # Larger targets (a /16 and up) are not expanded into a host filter;
+    # history queries then cover every host in the database
+    MAX_FILTER_HOSTS = 4096
+    
     def __init__(self, db_manager, port_scanner):
         """
         Initialize the monitoring scheduler
@@ -30,10 +39,24 @@ class MonitoringScheduler:
         self.scan_interval = 60  # minutes
         self.ports_to_scan = self.port_scanner.get_default_ports()
         
+        # Expanded host filter for history queries, rebuilt only when the
+        # target changes (the dashboard asks for it every second)
+        self._target_hosts = None
+        self._target_hosts_for = None
+        
+        # Results are written in batches: one transaction per save_batch_size
+        # results or save_batch_interval seconds, whichever comes first
+        self.save_batch_size = 100
+        self.save_batch_interval = 1.0
+        
         # Callbacks for UI updates
         self.scan_complete_callback = None
+        self.scan_result_callback = None
         self.status_update_callback = None
         
+        # One outage row per unreachable host, alongside its flagged TIMEOUT rows
+        self.port_scanner.set_host_down_callback(self._on_host_down)
+        
         # Load configuration from database
         self.load_configuration()
         
@@ -59,6 +82,10 @@ class MonitoringScheduler:
         """Set callback function to be called when scan completes"""
         self.scan_complete_callback = callback
     
+    def set_scan_result_callback(self, callback: Callable):
+        """Set callback function to be called for each port result as it arrives"""
+        self.scan_result_callback = callback
+    
     def set_status_update_callback(self, callback: Callable):
         """Set callback function for status updates"""
         self.status_update_callback = callback
@@ -71,6 +98,9 @@ class MonitoringScheduler:
         self.is_running = True
         self.stop_event.clear()
         
+        # Bring up the scanner's worker pool once for the life of the monitor
+        self.port_scanner.start()
+        
         # Clear any existing scheduled jobs
         schedule.clear()
         
@@ -136,23 +166,52 @@ class MonitoringScheduler:
             if self.status_update_callback:
                 self.status_update_callback(f"Scanning {self.target_host}...")
             
-            # Validate host before scanning
-            if not self.port_scanner.validate_host(self.target_host):
-                error_msg = f"Cannot resolve host: {self.target_host}"
+            # The target may be a single host or a list of hosts/CIDR blocks,
+            # expanded lazily by TargetSpec
+            targets = TargetSpec(self.target_host, self.ports_to_scan)
+            
+            # Validate named hosts before scanning
+            unresolved = [h for h in targets.hostnames if not self.port_scanner.validate_host(h)]
+            if unresolved:
+                error_msg = f"Cannot resolve host: {', '.join(unresolved)}"
                 if self.status_update_callback:
                     self.status_update_callback(error_msg)
-                return
+                if len(unresolved) == len(targets.host_entries):
+                    return
+            
+            # Perform the scan, reporting each port as it completes and
+            # persisting in small batches instead of waiting for the slowest probe.
+            # Only counts are kept, so memory stays flat on large sweeps.
+            total_ports = 0
+            open_ports = 0
+            blocked_email_ports = {}  # host -> blocked email port count
+            pending = []
+            last_save = time.monotonic()
+            for result in self.port_scanner.scan_targets(targets):
+                total_ports += 1
+                if result['status'] == 'OPEN':
+                    open_ports += 1
+                elif result['status'] in ('CLOSED', 'TIMEOUT') and result['port'] in self.EMAIL_PORTS:
+                    blocked_email_ports[result['host']] = blocked_email_ports.get(result['host'], 0) + 1
+                pending.append(result)
+                
+                if (len(pending) >= self.save_batch_size
+                        or time.monotonic() - last_save >= self.save_batch_interval):
+                    self.db_manager.save_scan_results(pending)
+                    pending = []
+                    last_save = time.monotonic()
+                
+                if self.scan_result_callback:
+                    self.scan_result_callback(result)
             
-            # Perform the scan
-            results = self.port_scanner.scan_multiple_ports(self.target_host, self.ports_to_scan)
+            if pending:
+                self.db_manager.save_scan_results(pending)
             
-            # Save results to database
-            self.db_manager.save_scan_results(results)
+            # Fold this cycle's writes back into the main file while it is quiet
+            self.db_manager.checkpoint()
             
             # Log scan completion
             scan_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            open_ports = len([r for r in results if r['status'] == 'OPEN'])
-            total_ports = len(results)
             
             status_msg = f"Scan completed at {scan_time}: {open_ports}/{total_ports} ports open"
             
@@ -161,10 +220,14 @@ class MonitoringScheduler:
             
             # Call scan complete callback if set
             if self.scan_complete_callback:
-                self.scan_complete_callback(results)
+                self.scan_complete_callback({
+                    'total_ports': total_ports,
+                    'open_ports': open_ports,
+                    'blocked_email_ports': blocked_email_ports
+                })
             
             # Check for potential blocking patterns
-            self._analyze_blocking_patterns(results)
+            self._analyze_blocking_patterns(blocked_email_ports)
             
         except Exception as e:
             error_msg = f"Scan failed: {str(e)}"
@@ -172,23 +235,37 @@ class MonitoringScheduler:
             if self.status_update_callback:
                 self.status_update_callback(error_msg)
     
-    def _analyze_blocking_patterns(self, results: List[dict]):
-        """Analyze scan results for potential blocking patterns"""
-        blocked_ports = [r for r in results if r['status'] in ['CLOSED', 'TIMEOUT']]
+    def _on_host_down(self, outage: dict):
+        """Persist and report a host outage event from the scanner"""
+        self.db_manager.save_host_outage(outage)
         
-        if blocked_ports:
-            # Check if email ports are specifically being blocked
-            email_ports = [25, 465, 587, 110, 995, 143, 993]
-            blocked_email_ports = [r for r in blocked_ports if r['port'] in email_ports]
-            
-            if len(blocked_email_ports) >= 3:  # Threshold for suspicious blocking
+        if self.status_update_callback:
+            self.status_update_callback(
+                f"HOST DOWN: {outage['host']} unreachable ({outage['reason']}), "
+                f"{len(outage['ports_timed_out'])} ports timed out, "
+                f"{outage['ports_skipped']} not probed"
+            )
+    
+    def _analyze_blocking_patterns(self, blocked_email_ports: Dict[str, int]):
+        """
+        Analyze a scan cycle for potential blocking patterns
+        
+        Args:
+            blocked_email_ports: Number of closed/timed out email ports per host
+        """
+        if blocked_email_ports:
+            # Check if email ports are specifically being blocked, per host
+            for host, blocked_count in blocked_email_ports.items():
+                if blocked_count < 3:  # Threshold for suspicious blocking
+                    continue
+                
                 current_time = datetime.now()
                 hour = current_time.hour
                 
                 # Log potential blocking event
                 blocking_msg = (
                     f"POTENTIAL BLOCKING DETECTED at {current_time.strftime('%H:%M:%S')}: "
-                    f"{len(blocked_email_ports)} email ports blocked"
+                    f"{blocked_count} email ports blocked on {host}"
                 )
                 
                 if self.status_update_callback:
@@ -207,11 +284,37 @@ class MonitoringScheduler:
         next_run = schedule.next_run()
         return next_run if next_run else None
     
+    def get_target_hosts(self) -> Optional[Tuple[str, ...]]:
+        """
+        Every host of the configured target, as a filter for history queries
+        
+        The target may list several hosts and CIDR blocks. The expansion is
+        cached until the target changes.
+        
+        Returns:
+            Tuple of hosts, an empty tuple if the target is invalid, or None
+            (no host filter) if it expands to more than MAX_FILTER_HOSTS
+        """
+        if self._target_hosts_for != self.target_host:
+            try:
+                spec = TargetSpec(self.target_host, self.ports_to_scan or [1])
+            except ValueError as e:
+                print(f"Invalid target '{self.target_host}': {e}")
+                self._target_hosts = ()
+            else:
+                if spec.host_count() > self.MAX_FILTER_HOSTS:
+                    self._target_hosts = None
+                else:
+                    self._target_hosts = tuple(spec.iter_hosts())
+            self._target_hosts_for = self.target_host
+        
+        return self._target_hosts
+    
     def get_last_scan_time(self) -> Optional[datetime]:
         """Get the time of the last scan"""
-        recent_scans = self.db_manager.get_recent_scans(limit=1, host=self.target_host)
+        recent_scans = self.db_manager.get_recent_scans(limit=1, host=self.get_target_hosts())
         if recent_scans:
-            return datetime.fromisoformat(recent_scans[0]['timestamp'])
+            return datetime.fromtimestamp(recent_scans[0].epoch_ms / 1000)
         return None
     
     def update_configuration(self, host: str = None, interval: int = None, ports: List[int] = None):
@@ -252,7 +355,7 @@ class MonitoringScheduler:
         start_time = end_time - timedelta(hours=hours)
         
         scans = self.db_manager.get_scans_by_timerange(
-            start_time, end_time, host=self.target_host
+            start_time, end_time, host=self.get_target_hosts()
         )
         
         if not scans:
@@ -267,7 +370,7 @@ class MonitoringScheduler:
         # Group scans by timestamp to count scan sessions
         scan_sessions = {}
         for scan in scans:
-            timestamp = scan['timestamp'][:16]  # Group by minute
+            timestamp = scan.epoch_ms // 60000  # Group by minute
             if timestamp not in scan_sessions:
                 scan_sessions[timestamp] = []
             scan_sessions[timestamp].append(scan)
@@ -313,8 +416,8 @@ class MonitoringScheduler:
         end_time = datetime.now()
         start_time = end_time - timedelta(days=days)
         
-        scans = self.db_manager.get_scans_by_timerange(
-            start_time, end_time, host=self.target_host
+        rollups = self.db_manager.get_hourly_rollups(
+            start_time, end_time, host=self.get_target_hosts()
         )
         
         # Generate report content
@@ -325,21 +428,21 @@ class MonitoringScheduler:
             f"Target Server: {self.target_host}",
             f"",
             f"SUMMARY:",
-            f"Total Scans: {len(scans)}",
+            f"Total Scans: {sum(rollup['total'] for rollup in rollups)}",
             f"Monitoring Period: {days} days",
             f""
         ]
         
         # Analyze by port
         port_analysis = {}
-        for scan in scans:
-            port = scan['port']
+        for rollup in rollups:
+            port = rollup['port']
             if port not in port_analysis:
                 port_analysis[port] = {
                     'total': 0, 'open': 0, 'closed': 0, 'timeout': 0, 'error': 0
                 }
-            port_analysis[port]['total'] += 1
-            port_analysis[port][scan['status'].lower()] += 1
+            for status in port_analysis[port]:
+                port_analysis[port][status] += rollup['total' if status == 'total' else f'{status}_count']
         
         report_lines.append("PORT ANALYSIS:")
         for port in sorted(port_analysis.keys()):
@@ -362,13 +465,12 @@ class MonitoringScheduler:
         
         # Group by hour and analyze blocking patterns
         hourly_stats = {}
-        for scan in scans:
-            hour = datetime.fromisoformat(scan['timestamp']).hour
+        for rollup in rollups:
+            hour = rollup['hour']
             if hour not in hourly_stats:
                 hourly_stats[hour] = {'total': 0, 'blocked': 0}
-            hourly_stats[hour]['total'] += 1
-            if scan['status'] in ['CLOSED', 'TIMEOUT']:
-                hourly_stats[hour]['blocked'] += 1
+            hourly_stats[hour]['total'] += rollup['total']
+            hourly_stats[hour]['blocked'] += rollup['closed_count'] + rollup['timeout_count']
         
         for hour in sorted(hourly_stats.keys()):
             stats = hourly_stats[hour]
@@ -379,6 +481,21 @@ class MonitoringScheduler:
                     f"({stats['blocked']}/{stats['total']} attempts blocked)"
                 )
         
+        # Cycles where the whole host stopped answering
+        outages = self.db_manager.get_host_outages(hours=days * 24, host=self.get_target_hosts())
+        report_lines.extend([
+            "",
+            "HOST OUTAGES:",
+            "(Scan cycles where no port answered at all)"
+        ])
+        for outage in reversed(outages):
+            report_lines.append(
+                f"{outage['timestamp'][:19].replace('T', ' ')} - {outage['host']}: {outage['reason']} "
+                f"({len(outage['ports_timed_out'])} ports timed out, {outage['ports_skipped']} not probed)"
+            )
+        if not outages:
+            report_lines.append("None")
+        
         # Write report to file
         with open(filename, 'w', encoding='utf-8') as f:
             f.write('\n'.join(report_lines))
@@ -396,15 +513,17 @@ if __name__ == "__main__":
     scheduler = MonitoringScheduler(db, scanner)
     
     # Set up callbacks
-    def on_scan_complete(results):
-        print(f"Scan completed: {len(results)} ports scanned")
-        for result in results:
-            print(f"  Port {result['port']}: {result['status']}")
+    def on_scan_complete(summary):
+        print(f"Scan completed: {summary['open_ports']}/{summary['total_ports']} ports open")
+    
+    def on_scan_result(result):
+        print(f"  Port {result['port']}: {result['status']}")
     
     def on_status_update(message):
         print(f"Status: {message}")
     
     scheduler.set_scan_complete_callback(on_scan_complete)
+    scheduler.set_scan_result_callback(on_scan_result)
     scheduler.set_status_update_callback(on_status_update)
     
     # Test configuration
@@ -0,0 +1,252 @@
+"""
+Sharded Scanner Module
+Splits very large target sets across worker processes for the Comcast Port Monitor
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+from typing import Dict, Iterator, List, Optional
+
+from port_scanner import AsyncPortScanner, RateLimiter, RetryPolicy
+from probes import ProbeRegistry
+from scan_result import ScanResult
+from targets import TargetSpec
+
+def _scan_shard(scanner_options: Dict, rate_options: Optional[Dict], targets: TargetSpec,
+                shard_index: int, shard_count: int, result_queue,
+                batch_size: int, flush_interval: float):
+    """
+    Worker process entry point: scan one shard and stream result batches
+    
+    Each batch is put on the queue as ('batch', shard_index, rows) where
+    rows are ScanResult.as_row() tuples with protocol_info already encoded
+    as JSON, and the worker always ends with
+    ('done', shard_index, error_message_or_None).
+    """
+    error = None
+    try:
+        rate_limiter = RateLimiter(**rate_options) if rate_options else None
+        scanner = AsyncPortScanner(rate_limiter=rate_limiter, **scanner_options)
+        
+        async def run():
+            rows = []
+            last_flush = time.monotonic()
+            
+            async for result in scanner._scan_pairs_async(targets.iter_shard(shard_index, shard_count)):
+                rows.append(result.as_row(encode_protocol_info=True))
+                
+                now = time.monotonic()
+                if len(rows) >= batch_size or now - last_flush >= flush_interval:
+                    result_queue.put(('batch', shard_index, rows))
+                    rows = []
+                    last_flush = now
+            
+            if rows:
+                result_queue.put(('batch', shard_index, rows))
+        
+        try:
+            asyncio.run(run())
+        finally:
+            scanner.shutdown()
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    
+    result_queue.put(('done', shard_index, error))
+
+class ShardedScanner:
+    def __init__(self, processes: Optional[int] = None, batch_size: int = 256,
+                 flush_interval: float = 1.0, timeout: int = 10,
+                 max_concurrency: int = 500, probe_protocols: bool = True,
+                 max_workers: int = 32, adaptive_timeout: bool = True,
+                 min_timeout: float = 1.0, http_probe: str = 'socket',
+                 retry_policy: Optional[RetryPolicy] = None,
+                 probes: Optional[ProbeRegistry] = None,
+                 rate: Optional[float] = None, burst: Optional[float] = None,
+                 per_host_rate: Optional[float] = None,
+                 per_host_burst: Optional[float] = None):
+        """
+        Initialize the sharded scanner
+        
+        The target space is split into one shard per process. Each worker
+        runs its own AsyncPortScanner loop, so building results and JSON
+        encoding protocol info happen in parallel instead of under a single
+        GIL, and results come back to the parent in compact tuple batches
+        that DatabaseManager.bulk_load stores without re-encoding.
+        
+        Args:
+            processes: Worker process count (defaults to the CPU count)
+            batch_size: Results per batch sent back to the parent
+            flush_interval: Maximum seconds a worker holds a partial batch
+            timeout: Connection timeout in seconds
+            max_concurrency: Concurrent connects per worker process
+            probe_protocols: Run protocol probes on open ports
+            max_workers: Protocol probe threads per worker process
+            adaptive_timeout: Derive connect timeouts from measured RTT
+            min_timeout: Lower bound for adaptive connect timeouts
+            http_probe: 'socket' or 'session' (see PortScanner)
+            retry_policy: Optional policy for retrying TIMEOUT results
+            probes: Protocol probes run on open ports (see PortScanner)
+            rate: Global connects per second, split evenly across processes
+            burst: Global burst size, split evenly across processes
+            per_host_rate: Connects per second to any single host
+            per_host_burst: Per-host burst size
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.scanner_options = {
+            'timeout': timeout,
+            'max_concurrency': max_concurrency,
+            'probe_protocols': probe_protocols,
+            'max_workers': max_workers,
+            'adaptive_timeout': adaptive_timeout,
+            'min_timeout': min_timeout,
+            'http_probe': http_probe,
+            'retry_policy': retry_policy,
+            'probes': probes
+        }
+        self.rate = rate
+        self.burst = burst
+        self.per_host_rate = per_host_rate
+        self.per_host_burst = per_host_burst
+        
+        # Statistics for the last scan
+        self.stats = {}
+    
+    def _rate_options(self, shard_count: int, by_host: bool) -> Optional[Dict]:
+        """Build per-process RateLimiter arguments that add up to the configured limits"""
+        if not self.rate and not self.per_host_rate:
+            return None
+        
+        options = {}
+        if self.rate:
+            options['rate'] = self.rate / shard_count
+            if self.burst is not None:
+                options['burst'] = max(1.0, self.burst / shard_count)
+        if self.per_host_rate:
+            # When pairs are dealt out, every process may hit the same host
+            divisor = 1 if by_host else shard_count
+            options['per_host_rate'] = self.per_host_rate / divisor
+            if self.per_host_burst is not None:
+                options['per_host_burst'] = max(1.0, self.per_host_burst / divisor)
+        return options
+    
+    def scan_batches(self, targets: TargetSpec) -> Iterator[List[tuple]]:
+        """
+        Scan a target specification, yielding raw result batches
+        
+        This is the cheapest way to consume results: rows are never turned
+        into ScanResult objects in the parent, and can be passed straight
+        to DatabaseManager.bulk_load.
+        
+        Args:
+            targets: TargetSpec describing hosts, CIDR blocks and port ranges
+        
+        Yields:
+            Lists of rows, each holding one result's values in
+            ScanResult.ROW_FIELDS order with protocol_info as JSON text
+        """
+        shard_count = max(1, min(self.processes, len(targets)))
+        by_host = targets.shards_by_host(shard_count)
+        rate_options = self._rate_options(shard_count, by_host)
+        
+        context = multiprocessing.get_context()
+        result_queue = context.Queue()
+        workers = [
+            context.Process(
+                target=_scan_shard,
+                args=(self.scanner_options, rate_options, targets, index, shard_count,
+                      result_queue, self.batch_size, self.flush_interval),
+                name=f'port-scan-shard-{index}',
+                daemon=True
+            )
+            for index in range(shard_count)
+        ]
+        
+        self.stats = {
+            'processes': shard_count,
+            'sharded_by': 'host' if by_host else 'pair',
+            'targets': len(targets),
+            'results': 0,
+            'batches': 0,
+            'errors': {},
+            'duration': 0.0
+        }
+        started = time.monotonic()
+        
+        for worker in workers:
+            worker.start()
+        
+        running = set(range(shard_count))
+        try:
+            while running:
+                try:
+                    message = result_queue.get(timeout=1.0)
+                except queue.Empty:
+                    # A worker that died without saying goodbye will never finish
+                    for index in list(running):
+                        if not workers[index].is_alive():
+                            running.discard(index)
+                            self.stats['errors'][index] = f'exited with code {workers[index].exitcode}'
+                    continue
+                
+                if message[0] == 'batch':
+                    _, _, rows = message
+                    self.stats['batches'] += 1
+                    self.stats['results'] += len(rows)
+                    yield rows
+                else:
+                    _, index, error = message
+                    running.discard(index)
+                    if error:
+                        self.stats['errors'][index] = error
+        finally:
+            # Consumer stopped early - stop the workers still scanning
+            if running:
+                for worker in workers:
+                    if worker.is_alive():
+                        worker.terminate()
+            for worker in workers:
+                worker.join()
+            result_queue.close()
+            self.stats['duration'] = time.monotonic() - started
+    
+    def scan_targets(self, targets: TargetSpec) -> Iterator[ScanResult]:
+        """
+        Scan a target specification across worker processes
+        
+        Args:
+            targets: TargetSpec describing hosts, CIDR blocks and port ranges
+        
+        Yields:
+            ScanResult records, in batch arrival order
+        """
+        for rows in self.scan_batches(targets):
+            for row in rows:
+                yield ScanResult.from_row(row)
+    
+    def get_stats(self) -> Dict:
+        """
+        Get statistics for the most recent scan
+        
+        Returns:
+            Dictionary with process count, shard mode, totals and throughput
+        """
+        stats = dict(self.stats)
+        duration = stats.get('duration') or 0.0
+        stats['results_per_second'] = stats.get('results', 0) / duration if duration else 0.0
+        return stats
+
+# Example usage and testing
+if __name__ == "__main__":
+    scanner = ShardedScanner(timeout=2)
+    targets = TargetSpec("127.0.0.1", "1-2000")
+    
+    print(f"Scanning {targets} with {scanner.processes} processes")
+    open_ports = [result['port'] for result in scanner.scan_targets(targets) if result['status'] == 'OPEN']
+    
+    print(f"Open ports: {sorted(open_ports)}")
+    print(f"Stats: {scanner.get_stats()}")
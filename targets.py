@@ -0,0 +1,209 @@
+"""
+Target Specification Module
+Expands hosts, CIDR blocks and port ranges into (host, port) scan targets
+"""
+
+import ipaddress
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Union
+
+class TargetSpec:
+    def __init__(self, hosts: Union[str, Iterable[str]], ports: Union[str, Iterable[int]]):
+        """
+        Initialize a target specification
+        
+        Nothing is expanded up front: CIDR blocks and port ranges are kept as
+        ranges and only turned into (host, port) pairs while iterating, so a
+        spec like 10.0.0.0/22 x 1-1024 never holds millions of pairs in memory.
+        
+        Args:
+            hosts: Hostnames, IP addresses and CIDR blocks, either as an
+                iterable or a comma/whitespace separated string
+                (e.g. "mail1.example.com, 10.0.0.0/22")
+            ports: Port numbers and ranges, either as an iterable of ints or a
+                comma separated string (e.g. "25,465,587,1-1024")
+        
+        Raises:
+            ValueError: If a host or port entry is invalid
+        """
+        self.host_entries = self.parse_hosts(hosts)
+        self.port_ranges = self.parse_ports(ports)
+        
+        if not self.host_entries:
+            raise ValueError("Target specification has no hosts")
+        if not self.port_ranges:
+            raise ValueError("Target specification has no ports")
+    
+    @staticmethod
+    def parse_hosts(hosts: Union[str, Iterable[str]]) -> List[Union[str, ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+        """
+        Parse host entries, keeping CIDR blocks as network objects
+        
+        Args:
+            hosts: Host specification string or iterable of entries
+        
+        Returns:
+            List of hostnames/addresses (str) and networks
+        """
+        if isinstance(hosts, str):
+            hosts = hosts.replace(',', ' ').split()
+        
+        entries = []
+        for entry in hosts:
+            entry = entry.strip()
+            if not entry:
+                continue
+            
+            if '/' in entry:
+                try:
+                    entries.append(ipaddress.ip_network(entry, strict=False))
+                except ValueError as e:
+                    raise ValueError(f"Invalid CIDR block '{entry}': {e}")
+            else:
+                entries.append(entry)
+        
+        return entries
+    
+    @staticmethod
+    def parse_ports(ports: Union[str, Iterable[int]]) -> List[range]:
+        """
+        Parse port entries into ranges
+        
+        Args:
+            ports: Port specification string or iterable of port numbers
+        
+        Returns:
+            List of port ranges
+        """
+        if isinstance(ports, str):
+            tokens = [token.strip() for token in ports.split(',') if token.strip()]
+        else:
+            tokens = list(ports) if not isinstance(ports, range) else [ports]
+        
+        port_ranges = []
+        for token in tokens:
+            if isinstance(token, range):
+                start, end = token.start, token.stop - 1
+            elif isinstance(token, str) and '-' in token:
+                start_text, _, end_text = token.partition('-')
+                try:
+                    start, end = int(start_text), int(end_text)
+                except ValueError:
+                    raise ValueError(f"Invalid port range '{token}'")
+            else:
+                try:
+                    start = end = int(token)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid port '{token}'")
+            
+            if not (1 <= start <= end <= 65535):
+                raise ValueError(f"Port range {start}-{end} is outside 1-65535")
+            
+            port_ranges.append(range(start, end + 1))
+        
+        return port_ranges
+    
+    @property
+    def hostnames(self) -> List[str]:
+        """Host entries that are names or single addresses (not CIDR blocks)"""
+        return [entry for entry in self.host_entries if isinstance(entry, str)]
+    
+    def iter_hosts(self) -> Iterator[str]:
+        """
+        Lazily yield every host in the specification
+        
+        Yields:
+            Hostname or IP address strings
+        """
+        for entry in self.host_entries:
+            if isinstance(entry, str):
+                yield entry
+            elif entry.num_addresses == 1:
+                yield str(entry.network_address)
+            else:
+                for address in entry.hosts():
+                    yield str(address)
+    
+    def iter_ports(self) -> Iterator[int]:
+        """Lazily yield every port in the specification"""
+        for port_range in self.port_ranges:
+            yield from port_range
+    
+    def host_count(self) -> int:
+        """Number of hosts the specification expands to"""
+        count = 0
+        for entry in self.host_entries:
+            if isinstance(entry, str):
+                count += 1
+            elif entry.num_addresses <= 2:
+                count += entry.num_addresses
+            elif entry.version == 4:
+                # hosts() skips the network and broadcast addresses
+                count += entry.num_addresses - 2
+            else:
+                # hosts() skips the subnet-router anycast address
+                count += entry.num_addresses - 1
+        return count
+    
+    def port_count(self) -> int:
+        """Number of ports the specification expands to"""
+        return sum(len(port_range) for port_range in self.port_ranges)
+    
+    def __len__(self) -> int:
+        return self.host_count() * self.port_count()
+    
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        """
+        Yield (host, port) pairs, interleaving hosts
+        
+        Iteration is port-major: every host is probed on one port before any
+        host is probed on the next, so consecutive probes go to different hosts
+        and no single host is hammered.
+        
+        Yields:
+            (host, port) tuples
+        """
+        for port in self.iter_ports():
+            for host in self.iter_hosts():
+                yield host, port
+    
+    def iter_shard(self, index: int, count: int) -> Iterator[Tuple[str, int]]:
+        """
+        Yield the (host, port) pairs belonging to one of count shards
+        
+        With at least as many hosts as shards, whole hosts are dealt out
+        round-robin so each host's RTT estimate, TLS sessions and rate limit
+        stay in one process. With fewer hosts, pairs are dealt out instead so
+        every shard still gets work.
+        
+        Args:
+            index: Shard number (0 to count - 1)
+            count: Total number of shards
+        
+        Yields:
+            (host, port) tuples, port-major like __iter__
+        """
+        if not 0 <= index < count:
+            raise ValueError(f"Shard {index} is outside 0-{count - 1}")
+        
+        if self.shards_by_host(count):
+            for port in self.iter_ports():
+                for host in islice(self.iter_hosts(), index, None, count):
+                    yield host, port
+        else:
+            yield from islice(self, index, None, count)
+    
+    def shards_by_host(self, count: int) -> bool:
+        """Check whether iter_shard splits by host (True) or by pair (False)"""
+        return self.host_count() >= count
+    
+    def __repr__(self) -> str:
+        return f"TargetSpec({self.host_count()} hosts x {self.port_count()} ports)"
+
+# Example usage and testing
+if __name__ == "__main__":
+    spec = TargetSpec("mail.comcast.net, 10.0.0.0/30", "25,465,587,1-3")
+    print(spec, len(spec))
+    
+    for host, port in spec:
+        print(f"{host}:{port}")